@@ -1,104 +1,217 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from backend.app.services.ai_service import AIService
+from backend.app.services.chat_completions_service import ChatCompletionsService
+from backend.app.services.fallback_responder import FallbackResponder
+from backend.app.services.response_cache import CachedResponse, ResponseCache
+from backend.app.services.run_stream import RunStream, RunStreamRegistry
+from backend.app.services.run_scheduler import Priority, RunScheduler, SchedulerFull
+from backend.app.services.thread_actor import ThreadActors
+from backend.app.services.thread_pool import ThreadPool
+from backend.app.services.tool_call_handler import ToolCallHandler
+from backend.app.services.product_service import ProductService
+from backend.app.services.cart_service import CartService
 from backend.app.core.config import settings
+from backend.app.core.event_handler import ChatEventHandler
+from backend.app.core.metrics import metrics
+from backend.app.core.resilience import CircuitOpen
+from backend.app.core.sse import encode_frames
+from backend.app.core.timing import RequestTiming
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+import asyncio
+import hashlib
 import logging
 import json
-import asyncio
-from openai import OpenAI
-from openai.types.beta.threads import Run
-from typing_extensions import override
 
 router = APIRouter()
 
-class AIService:
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4-turbo-preview"):
-        self.client = OpenAI(api_key=api_key or settings.OPENAI_API_KEY)
-        self.model = model
-        self.assistant = self.create_assistant()
-
-    def create_assistant(self):
-        return self.client.beta.assistants.create(
-            name="eShop Assistant",
-            instructions="You are an AI assistant for an e-commerce platform. Help users find products, manage their cart, and answer questions about the shopping process.",
-            tools=self.default_tools(),
-            model=self.model
-        )
-
-    def default_tools(self):
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_product_info",
-                    "description": "Get information about a specific product",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_id": {"type": "string", "description": "The ID of the product"}
-                        },
-                        "required": ["product_id"]
-                    }
-                }
-            },
-            # Add other tools here...
-        ]
-
-    def create_thread(self):
-        return self.client.beta.threads.create()
-
-    def add_message_to_thread(self, thread_id: str, role: str, content: str):
-        return self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role=role,
-            content=content
-        )
-
-    def run_assistant(self, thread_id: str, instructions: str = None):
-        return self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=self.assistant.id,
-            instructions=instructions
-        )
-
-    def get_run_status(self, thread_id: str, run_id: str) -> Run:
-        return self.client.beta.threads.runs.retrieve(
-            thread_id=thread_id,
-            run_id=run_id
-        )
-
-    def get_messages(self, thread_id: str):
-        return self.client.beta.threads.messages.list(thread_id=thread_id)
-
-class EventHandler:
-    def __init__(self, handle_chunk_func):
-        self.handle_chunk_func = handle_chunk_func
-
-    @override
-    def on_text_created(self, text) -> None:
-        self.handle_chunk_func({"type": "start", "content": ""})
-
-    @override
-    def on_text_delta(self, delta, snapshot):
-        self.handle_chunk_func({"type": "stream", "content": delta.value})
-
-    def on_tool_call_created(self, tool_call):
-        self.handle_chunk_func({"type": "tool_call", "content": str(tool_call)})
-
-    def on_tool_call_delta(self, delta, snapshot):
-        self.handle_chunk_func({"type": "tool_call_delta", "content": str(delta)})
-
-    @classmethod
-    def on_end(cls):
-        print("\n\nAll streams have ended.")
-
-ai_service = AIService()
+# Constructing the service does no I/O; the assistant is resolved by warm_up()
+# in the app lifespan, or lazily by the first run if a request beats it.
+ai_service = ChatCompletionsService() if settings.CHAT_BACKEND == "completions" else AIService()
+run_streams = RunStreamRegistry()
+run_scheduler = RunScheduler()
+thread_actors = ThreadActors(run_scheduler, run_streams)
+product_service = ProductService()
+fallback_responder = FallbackResponder()
+response_cache = ResponseCache()
+cart_services: "OrderedDict[str, CartService]" = OrderedDict()
+
+async def create_thread_id() -> str:
+    thread = await ai_service.create_thread()
+    return thread.id
+
+# Completions mode creates conversations locally, so there is nothing worth pre-creating.
+thread_pool = ThreadPool(create_thread_id, low=0, high=0) if ai_service.backend == "completions" else ThreadPool(create_thread_id)
+
+async def warm_up():
+    await ai_service.warm_up()
+
+async def warm_up_caches():
+    await thread_pool.warm_up()
+
+async def shutdown():
+    thread_pool.close()
 
 @router.post("/start")
 async def start_chat():
-    thread = ai_service.create_thread()
-    return {"thread_id": thread.id}
+    # Normally a pop from the warm pool; only an empty pool costs an OpenAI round-trip.
+    return {"thread_id": await thread_pool.acquire()}
+
+def tool_handler_for(thread_id: str, timing: Optional[RequestTiming] = None) -> ToolCallHandler:
+    # The chat thread is the shopping session, so each thread gets its own cart.
+    cart_service = cart_services.pop(thread_id, None) or CartService()
+    cart_services[thread_id] = cart_service
+    while len(cart_services) > settings.CHAT_SESSION_CACHE_SIZE:
+        cart_services.popitem(last=False)
+    return ToolCallHandler(product_service, cart_service, timing)
+
+async def opening_exchange(thread_id: str, messages: int) -> bool:
+    # Only a thread's first question is answered from or stored in the response cache; later ones
+    # may lean on earlier turns. Any worker may serve a thread, so ask the thread itself whether it
+    # holds no more than `messages` (0 before the question, 2 once answered). Unknown means no.
+    count = await ai_service.count_messages(thread_id, messages + 1)
+    return count is not None and count <= messages
+
+def response_scope(instructions: Optional[str]) -> str:
+    # Cached answers are shared only under the same assistant definition, instructions and catalog.
+    digest = hashlib.sha256((instructions or "").encode()).hexdigest()[:16]
+    return f"{ai_service.backend}:{ai_service.definition_hash}:{digest}:{product_service.version}"
+
+async def produce_run(stream: RunStream, thread_id: str, message: str, instructions: Optional[str],
+                      timing: RequestTiming, cache_as: Optional[str] = None):
+    shareable_answer = None
+    try:
+        handlers = []
+
+        def new_handler():
+            handlers.append(ChatEventHandler(stream.publish, timing))
+            return handlers[-1]
+
+        tool_handler = tool_handler_for(thread_id, timing)
+        with timing.span("run"):
+            run = await ai_service.run_assistant(thread_id, instructions, new_handler, tool_handler)
+        if cache_as and run.status == "completed" and not tool_handler.touched_session():
+            shareable_answer = "".join(h.full_response for h in handlers)
+        last_message_id = next((h.last_message_id for h in reversed(handlers) if h.last_message_id), None)
+        if run.status != "completed":
+            # failed, cancelled, expired, or incomplete (e.g. out of tool rounds): the answer is missing or cut short.
+            await stream.publish({'type': 'error', 'content': f'Run {run.status}'})
+        if any(h.full_response for h in handlers) and last_message_id:
+            ai_service.advance_cursor(thread_id, last_message_id)
+        elif run.status == "completed":
+            # Nothing came through as deltas: fetch just this run's messages.
+            with timing.span("fetch_messages"):
+                messages = await ai_service.get_new_messages(thread_id, run.id)
+            for message in messages:
+                if message.role == "assistant":
+                    for content in message.content:
+                        if content.type == "text":
+                            await stream.publish({'type': 'stream', 'content': content.text.value})
+    except CircuitOpen:
+        # The circuit opened while this run was queued, or another request holds the half-open trial.
+        await answer_locally(stream, thread_id, message)
+        return
+    except Exception as e:
+        logging.error(f"Error while streaming run: {str(e)}")
+        await stream.publish({'type': 'error', 'content': 'Run failed'})
+    # Trailer: the full per-stage breakdown, in Server-Timing syntax, once the run is over.
+    breakdown = timing.finish()
+    if shareable_answer and await opening_exchange(thread_id, 2):
+        response_cache.set(response_scope(instructions), cache_as, shareable_answer, breakdown["total"] / 1000)
+    await stream.publish({'type': 'timing', 'content': timing.server_timing()})
+    await stream.publish({'type': 'end', 'content': ''})
+
+async def answer_locally(stream: RunStream, thread_id: str, message: str):
+    # Degraded mode: no LLM and no OpenAI thread, just the catalog tools behind a template.
+    metrics.inc("chat_degraded_answers_total")
+    try:
+        content = await fallback_responder.answer(tool_handler_for(thread_id), message)
+        await stream.publish({'type': 'start', 'content': ''})
+        await stream.publish({'type': 'stream', 'content': content})
+    except Exception as e:
+        logging.error(f"Error in degraded answer: {str(e)}")
+        await stream.publish({'type': 'error', 'content': 'Chat is temporarily unavailable'})
+    await stream.publish({'type': 'end', 'content': ''})
+
+async def answer_from_cache(stream: RunStream, thread_id: str, message: str, cached: CachedResponse,
+                            timing: RequestTiming):
+    # Same frames as a run, with the stored answer cut into coalesced-delta sized chunks.
+    with timing.span("response_cache"):
+        await stream.publish({'type': 'start', 'content': ''})
+        for i in range(0, len(cached.answer), settings.STREAM_COALESCE_BYTES):
+            await stream.publish({'type': 'stream', 'content': cached.answer[i:i + settings.STREAM_COALESCE_BYTES]})
+    breakdown = timing.finish()
+    response_cache.record_saved(cached, breakdown["total"] / 1000)
+    await stream.publish({'type': 'timing', 'content': timing.server_timing()})
+    try:
+        # Before "end", so the client's next message already sees this turn in the thread.
+        await ai_service.record_exchange(thread_id, message, cached.answer)
+    except Exception as e:
+        logging.error(f"Error recording cached answer in thread: {str(e)}")
+    await stream.publish({'type': 'end', 'content': ''})
+
+# There is no auth in the app yet, so nothing a client sends can be trusted to rank it and
+# everyone shares one class. An auth layer sets this to a callable (headers, query_params) -> Priority
+# that verifies the customer, e.g. LOGGED_IN for a valid session and CHECKOUT during checkout.
+priority_resolver: Optional[Callable[..., Priority]] = None
+
+def request_priority(headers, query_params) -> Priority:
+    if priority_resolver is None:
+        return Priority.ANONYMOUS
+    return priority_resolver(headers, query_params)
+
+async def start_run_stream(thread_id: str, message: str, instructions: Optional[str] = None,
+                           priority: Priority = Priority.ANONYMOUS, timing: Optional[RequestTiming] = None) -> RunStream:
+    # Raises SchedulerFull before anything is sent upstream, so shed requests cost nothing.
+    # Messages for a thread that is still running are merged into its next run.
+    # A thread's opening question may be answered from the response cache, even while the circuit is open;
+    # the cached reply holds the thread like a run, so a follow-up waits until it is recorded.
+    # While the OpenAI circuit is open, other messages are answered locally without queueing;
+    # half-open, the first upstream call takes the trial and the rest fall back when they raise CircuitOpen.
+    timing = timing or RequestTiming(ai_service.model, ai_service.backend, thread_id=thread_id)
+    cache_as = message if response_cache.eligible(message) else None
+    if ai_service.breaker.is_open and cache_as is None:
+        return run_streams.start(lambda stream: answer_locally(stream, thread_id, message))
+
+    async def answer(content: str, instructions: Optional[str]):
+        # Asked by thread_actors for an idle thread, before it queues for a run.
+        cached = response_cache.get(response_scope(instructions), content) if await opening_exchange(thread_id, 0) else None
+        if cached is not None:
+            timing.backend = "response_cache"  # Kept out of the backend's latency numbers
+            return lambda stream: answer_from_cache(stream, thread_id, content, cached, timing)
+        if ai_service.breaker.is_open:
+            return lambda stream: answer_locally(stream, thread_id, content)
+        return None
+
+    async def run(stream: RunStream, content: str, instructions: Optional[str]):
+        timing.context["stream_id"] = stream.id
+        try:
+            with timing.span("add_message"):
+                await ai_service.add_message_to_thread(thread_id, "user", content)
+        except CircuitOpen:
+            await answer_locally(stream, thread_id, content)
+            return
+        except Exception as e:
+            logging.error(f"Error adding message to thread: {str(e)}")
+            await stream.publish({'type': 'error', 'content': 'Message could not be sent'})
+            await stream.publish({'type': 'end', 'content': ''})
+            return
+        # Merged messages are not one question, so their answer is not cached.
+        await produce_run(stream, thread_id, content, instructions, timing, cache_as if content == message else None)
+
+    with timing.span("queue"):
+        return await thread_actors.submit(thread_id, message, instructions, priority, run, answer if cache_as else None)
+
+def sse_response(stream: RunStream, after: int = 0, timing: Optional[RequestTiming] = None) -> StreamingResponse:
+    async def event_generator():
+        # Reads from the run's replay buffer; the run itself keeps going if the client drops.
+        async for batch in stream.subscribe_batches(after):
+            yield encode_frames((run_streams.format_event_id(stream, seq), frame) for seq, frame in batch)
+
+    # Only the stages before the first byte are known here; the rest follows in the "timing" frame.
+    headers = {"Server-Timing": timing.server_timing()} if timing is not None else None
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
 
 @router.get("/stream")
 async def stream_message(request: Request):
@@ -108,6 +221,16 @@ async def stream_message(request: Request):
         thread_id = request.query_params.get('thread_id')
         instructions = request.query_params.get('instructions')
 
+        last_event = run_streams.parse_event_id(request.headers.get('last-event-id'))
+        if last_event:
+            # Reconnect: resume the existing run from the buffer instead of re-sending the message.
+            stream_id, seq = last_event
+            stream = run_streams.get(stream_id)
+            if stream is None:
+                raise HTTPException(status_code=410, detail="Stream expired")
+            logging.info(f'Resuming stream {stream_id} after event {seq}')
+            return sse_response(stream, seq)
+
         if not message or not thread_id:
             raise HTTPException(status_code=400, detail="Message and thread_id are required")
 
@@ -115,28 +238,98 @@ async def stream_message(request: Request):
         logging.info(f'Thread ID: {thread_id}')
         logging.info(f'Instructions: {instructions}')
 
-        ai_service.add_message_to_thread(thread_id, "user", message)
+        timing = RequestTiming(ai_service.model, ai_service.backend, thread_id=thread_id)
+        stream = await start_run_stream(thread_id, message, instructions,
+                                        request_priority(request.headers, request.query_params), timing)
+        return sse_response(stream, timing=timing)
 
-        async def event_generator():
-            run = ai_service.run_assistant(thread_id, instructions)
-            
-            while True:
-                run_status = ai_service.get_run_status(thread_id, run.id)
-                if run_status.status == "completed":
-                    messages = ai_service.get_messages(thread_id)
-                    for message in messages.data:
-                        if message.role == "assistant":
-                            yield f"data: {json.dumps({'type': 'stream', 'content': message.content[0].text.value})}\n\n"
-                    break
-                elif run_status.status == "failed":
-                    yield f"data: {json.dumps({'type': 'error', 'content': 'Run failed'})}\n\n"
-                    break
-                await asyncio.sleep(1)  # Poll every second
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in stream_message: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-            yield f"data: {json.dumps({'type': 'end', 'content': ''})}\n\n"
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    # One connection carries any number of threads. Client frames:
+    #   {"type": "start", "ref": ...}                                  -> {"type": "started", "ref", "thread_id"}
+    #   {"type": "message", "thread_id", "message", "instructions"?}  -> run frames
+    #   {"type": "resume", "thread_id", "event_id"}                    -> run frames after event_id
+    #   {"type": "unsubscribe", "thread_id"}
+    # Run frames are the SSE frames plus "thread_id" and "id", so the client can demultiplex and resume.
+    await websocket.accept()
+    priority = request_priority(websocket.headers, websocket.query_params)
+    send_lock = asyncio.Lock()
+    # One forwarder per (thread_id, stream id); each runs until its stream ends.
+    forwarders: Dict[Tuple[str, str], asyncio.Task] = {}
 
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+    async def send(frame: dict):
+        async with send_lock:
+            await websocket.send_text(json.dumps(frame))
 
-    except Exception as e:
-        logging.error(f"Error in stream_message: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+    async def forward(thread_id: str, stream: RunStream, after: int = 0):
+        async for seq, frame in stream.subscribe(after):
+            await send({**frame, "thread_id": thread_id, "id": run_streams.format_event_id(stream, seq)})
+
+    def follow(thread_id: str, stream: RunStream, after: int = 0):
+        # A message merged into a waiting batch gets the batch's stream, while the thread's
+        # current run may still be streaming: both are forwarded until they end.
+        key = (thread_id, stream.id)
+        if key in forwarders and after == 0:
+            return  # A merged message: its frames already come through this forwarder.
+        previous = forwarders.pop(key, None)
+        if previous:
+            previous.cancel()  # A resume of the same stream: restart from the requested event
+        task = asyncio.create_task(forward(thread_id, stream, after))
+        forwarders[key] = task
+        task.add_done_callback(lambda done: forwarders.pop(key) if forwarders.get(key) is done else None)
+
+    async def handle(frame: dict):
+        thread_id = frame.get("thread_id")
+        try:
+            if frame.get("type") == "start":
+                await send({"type": "started", "ref": frame.get("ref"), "thread_id": await thread_pool.acquire()})
+            elif frame.get("type") == "message" and thread_id and frame.get("message"):
+                stream = await start_run_stream(thread_id, frame["message"], frame.get("instructions"), priority)
+                follow(thread_id, stream)
+            elif frame.get("type") == "resume" and thread_id:
+                last_event = run_streams.parse_event_id(frame.get("event_id"))
+                stream = run_streams.get(last_event[0]) if last_event else None
+                if stream is None:
+                    await send({"type": "error", "content": "Stream expired", "thread_id": thread_id})
+                else:
+                    follow(thread_id, stream, last_event[1])
+            elif frame.get("type") == "unsubscribe" and thread_id:
+                for key in [key for key in forwarders if key[0] == thread_id]:
+                    forwarders.pop(key).cancel()
+            else:
+                await send({"type": "error", "content": "Invalid frame", "thread_id": thread_id})
+        except SchedulerFull as e:
+            await send({"type": "error", "content": str(e), "thread_id": thread_id, "retry_after": e.retry_after})
+        except Exception as e:
+            logging.error(f"Error in chat_websocket: {str(e)}")
+            await send({"type": "error", "content": str(e), "thread_id": thread_id})
+
+    pending: Set[asyncio.Task] = set()
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except ValueError:
+                await send({"type": "error", "content": "Invalid JSON"})
+                continue
+            if not isinstance(frame, dict):
+                await send({"type": "error", "content": "Invalid frame"})
+                continue
+            # Handle each request concurrently so one slow thread does not hold up the others.
+            task = asyncio.create_task(handle(frame))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        logging.info("Chat websocket disconnected")
+    finally:
+        # Runs keep going in the background and stay resumable; only stop forwarding.
+        for task in [*forwarders.values(), *pending]:
+            task.cancel()
@@ -5,8 +5,69 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "eShop Assistant"
     OPENAI_API_KEY: str
     ASSISTANT_ID: Optional[str] = None  # Changed from OPENAI_ASSISTANT_ID and made optional
+    ASSISTANT_CACHE_PATH: str = ".assistant_cache.json"  # Definition hash -> assistant id, shared by workers
     DATABASE_URL: Optional[str] = None  # Made optional
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8000"  # Default value added
+    OPENAI_BASE_URL: Optional[str] = None  # e.g. a local stand-in for load tests
+    CHAT_BACKEND: str = "assistants"  # "assistants" (OpenAI threads/runs) or "completions" (local history)
+    # Context sent per turn in completions mode (see services/context_builder.py)
+    CONTEXT_TOKEN_BUDGET: int = 3000  # Summary + recent messages, system prompt excluded
+    CONTEXT_TRIM_TO: float = 0.75  # Over budget, trim to this share so the prefix stays stable for a few turns
+    CONTEXT_SUMMARY_TOKENS: int = 400  # Cap on the rolling summary of folded turns
+    CONTEXT_SUMMARIZER: str = "local"  # "local" (extractive, no API call) or "llm" (folds in the background)
+    # Shared upstream HTTP transport (one pool per worker, see core/http_client.py)
+    OPENAI_MAX_CONNECTIONS: int = 500  # Upper bound on concurrent upstream requests per worker
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    OPENAI_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle connection stays pooled
+    OPENAI_HTTP2: bool = True  # Needs the h2 package; falls back to HTTP/1.1 without it
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    OPENAI_READ_TIMEOUT: float = 120.0
+    OPENAI_POOL_TIMEOUT: float = 10.0  # Wait for a free pooled connection
+    OPENAI_PREWARM_CONNECTIONS: int = 4  # Connections opened during warm-up
+    # Retries and hedging for short OpenAI calls (see core/resilience.py)
+    OPENAI_RETRY_ATTEMPTS: int = 3  # Attempts per call, including the first
+    OPENAI_RETRY_BASE_DELAY: float = 0.2  # Seconds; doubles per attempt, full jitter
+    OPENAI_RETRY_MAX_DELAY: float = 2.0
+    OPENAI_CALL_DEADLINE: float = 10.0  # Seconds for all attempts of one call together
+    OPENAI_HEDGE_ENABLED: bool = True  # Second request for slow idempotent reads
+    OPENAI_HEDGE_DELAY: float = 1.0  # Until HEDGE_MIN_SAMPLES latencies are known
+    OPENAI_HEDGE_MIN_DELAY: float = 0.05
+    OPENAI_HEDGE_MIN_SAMPLES: int = 20  # Then hedge after the observed p95
+    # Circuit breaker: while open, chat answers from the local catalog without the LLM
+    OPENAI_BREAKER_WINDOW: int = 50  # Recent upstream calls considered
+    OPENAI_BREAKER_MIN_CALLS: int = 20  # No verdict on fewer calls
+    OPENAI_BREAKER_FAILURE_RATIO: float = 0.5
+    OPENAI_BREAKER_SLOW_CALL: float = 5.0  # Seconds; slower calls count as slow
+    OPENAI_BREAKER_SLOW_RATIO: float = 0.5
+    OPENAI_BREAKER_OPEN_SECONDS: float = 30.0  # Before a trial request is let through
+    THREAD_CURSOR_CACHE_SIZE: int = 10000  # Threads whose last-seen message id is remembered
+    SSE_REPLAY_BUFFER_SIZE: int = 1024  # Frames kept per run for Last-Event-ID resume
+    SSE_REPLAY_TTL: float = 300.0  # Seconds a finished run stays resumable
+    SSE_REPLAY_MAX_STREAMS: int = 5000
+    SSE_SUBSCRIBER_QUEUE_SIZE: int = 64  # Frames queued per reader before the run waits for it
+    SSE_BACKPRESSURE_TIMEOUT: float = 15.0  # Seconds a stalled reader may hold the run before it is detached
+    STREAM_COALESCE_MS: float = 30.0  # Text deltas are merged for up to this long; 0 sends each delta
+    STREAM_COALESCE_BYTES: int = 256  # ...or until this many characters are buffered
+    TOOL_EXECUTOR_WORKERS: int = 16  # Threads for synchronous tool implementations
+    CHAT_SESSION_CACHE_SIZE: int = 10000  # Per-thread carts kept for assistant tool calls
+    RUN_MAX_CONCURRENT: int = 200  # Active assistant runs per worker
+    RUN_MAX_PER_SESSION: int = 1  # OpenAI allows one active run per thread anyway
+    RUN_QUEUE_MAX: int = 500  # Waiting runs before new ones get 429
+    RUN_QUEUE_MAX_WAIT: float = 10.0  # Seconds a run may wait for a slot before 429
+    CHAT_MERGE_WINDOW_MS: float = 300.0  # Debounce before a run that waited on the thread's previous run
+    THREAD_POOL_LOW: int = 20  # Refill the pre-created thread pool below this many...
+    THREAD_POOL_HIGH: int = 100  # ...up to this many; 0 disables the pool
+    THREAD_POOL_BATCH: int = 10  # Threads created concurrently per refill step
+    THREAD_POOL_MAX_AGE: float = 6 * 3600.0  # Seconds before an unused pooled thread is discarded
+    TOOL_CACHE_MAX_ENTRIES: int = 10000  # LRU bound of the read-only tool result cache
+    TOOL_CACHE_PRODUCT_TTL: float = 300.0  # Seconds; get_product_info
+    TOOL_CACHE_SEARCH_TTL: float = 60.0  # search_products
+    TOOL_CACHE_CART_TTL: float = 30.0  # get_cart_summary (also invalidated by any cart change)
+    RESPONSE_CACHE_ENABLED: bool = True  # Serve repeated first-turn questions without a run
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+    RESPONSE_CACHE_TTL: float = 3600.0  # Seconds a cached answer is served
+    RESPONSE_CACHE_SIMILARITY: float = 0.65  # Cosine similarity of a rephrasing; content words must match as well
+    RESPONSE_CACHE_MIN_WORDS: int = 3  # Shorter messages are too ambiguous to share an answer
 
     class Config:
         env_file = ".env"
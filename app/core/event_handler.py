@@ -1,24 +1,78 @@
-from openai import AssistantEventHandler
-from typing import Callable, Any
+from openai import AsyncAssistantEventHandler
+from typing import Callable, Awaitable, Any, List, Optional
+from backend.app.core.config import settings
+from backend.app.core.timing import RequestTiming
+import asyncio
 import json
 
-class ChatEventHandler(AssistantEventHandler):
-    def __init__(self, send_func: Callable[[dict], Any]):
+class DeltaCoalescer:
+    """Merges small text deltas into one "stream" frame per size or time window."""
+
+    def __init__(self, send_func: Callable[[dict], Awaitable[Any]], window_ms: Optional[float] = None, max_chars: Optional[int] = None):
         self.send_func = send_func
+        self.window = (settings.STREAM_COALESCE_MS if window_ms is None else window_ms) / 1000
+        self.max_chars = settings.STREAM_COALESCE_BYTES if max_chars is None else max_chars
+        self.buffer: List[str] = []
+        self.size = 0
+        self._timer: Optional[asyncio.Task] = None
+        # Keeps frames in order when the timer and a size-triggered flush race.
+        self._lock = asyncio.Lock()
+
+    async def add(self, text: str) -> None:
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.window <= 0 or self.size >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        async with self._lock:
+            if not self.buffer:
+                return
+            content = "".join(self.buffer)
+            self.buffer.clear()
+            self.size = 0
+            await self.send_func({"type": "stream", "content": content})
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+class ChatEventHandler(AsyncAssistantEventHandler):
+    def __init__(self, send_func: Callable[[dict], Awaitable[Any]], timing: Optional[RequestTiming] = None):
+        super().__init__()
+        self.send_func = send_func
+        self.timing = timing
+        self.coalescer = DeltaCoalescer(send_func)
         self.full_response = ""
+        self.last_message_id = None
 
-    async def on_text_created(self, text: str) -> None:
+    async def on_text_created(self, text: Any) -> None:
+        await self.coalescer.flush()
         await self.send_func({"type": "start", "content": ""})
 
-    async def on_text_delta(self, delta: str, snapshot: str) -> None:
-        self.full_response += delta
-        await self.send_func({"type": "stream", "content": delta})
+    async def on_text_delta(self, delta: Any, snapshot: Any) -> None:
+        if not delta.value:
+            return
+        if self.timing is not None:
+            self.timing.mark("first_delta")
+        self.full_response += delta.value
+        await self.coalescer.add(delta.value)
 
     async def on_tool_call_created(self, tool_call: Any) -> None:
+        await self.coalescer.flush()
         await self.send_func({"type": "tool_call", "content": str(tool_call)})
 
     async def on_tool_call_delta(self, delta: Any, snapshot: Any) -> None:
+        await self.coalescer.flush()
         await self.send_func({"type": "tool_call_delta", "content": str(delta)})
 
-    async def on_run_completed(self) -> None:
-        await self.send_func({"type": "end", "content": self.full_response})
\ No newline at end of file
+    async def on_message_done(self, message: Any) -> None:
+        self.last_message_id = message.id
+
+    async def on_end(self) -> None:
+        await self.coalescer.flush()
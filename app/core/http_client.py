@@ -0,0 +1,77 @@
+from typing import Any, Dict
+from openai import DefaultAsyncHttpxClient
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import httpx
+import logging
+import time
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _connection_tracer():
+    # httpcore reports connection setup through the "trace" request extension.
+    started: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        step, _, phase = event_name.rpartition(".")
+        if step not in ("connection.connect_tcp", "connection.start_tls"):
+            return
+        if phase == "started":
+            started[step] = time.perf_counter()
+        elif phase == "complete" and step in started:
+            elapsed = time.perf_counter() - started.pop(step)
+            if step == "connection.connect_tcp":
+                metrics.inc("upstream_connections_opened_total")
+                metrics.observe("upstream_connect_seconds", elapsed)
+            else:
+                metrics.observe("upstream_tls_seconds", elapsed)
+
+    return trace
+
+async def _attach_tracer(request: httpx.Request) -> None:
+    request.extensions["trace"] = _connection_tracer()
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = settings.OPENAI_HTTP2
+    if http2 and not _http2_available():
+        logging.warning("OPENAI_HTTP2 is enabled but the h2 package is missing; using HTTP/1.1")
+        http2 = False
+    return DefaultAsyncHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.OPENAI_READ_TIMEOUT,
+            connect=settings.OPENAI_CONNECT_TIMEOUT,
+            pool=settings.OPENAI_POOL_TIMEOUT,
+        ),
+        event_hooks={"request": [_attach_tracer]},
+    )
+
+def pool_stats(client: httpx.AsyncClient) -> Dict[str, int]:
+    # httpx does not expose its pool publicly; read httpcore's view of it.
+    pool = getattr(client, "_transport", None)
+    connections = getattr(getattr(pool, "_pool", None), "connections", None)
+    if connections is None:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    stats = {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "max_connections": settings.OPENAI_MAX_CONNECTIONS,
+    }
+    for name, value in stats.items():
+        metrics.set_gauge(f"upstream_pool_{name}", value)
+    return stats
+
+# One pool for every upstream (OpenAI) call in this worker; closed in the app lifespan.
+upstream_http_client = create_http_client()
@@ -0,0 +1,49 @@
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+
+class Readiness:
+    """Tracks which subsystems have finished warming up for the /ready probe."""
+
+    def __init__(self, max_backoff: float = 30.0):
+        self.components: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self.ready: Dict[str, bool] = {}
+        self.errors: Dict[str, Optional[str]] = {}
+        self.max_backoff = max_backoff
+
+    def register(self, name: str, warm_up: Callable[[], Awaitable[None]]) -> None:
+        self.components[name] = warm_up
+        self.ready[name] = False
+        self.errors[name] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return all(self.ready.values())
+
+    def report(self) -> Dict[str, dict]:
+        return {
+            name: {"ready": self.ready[name], "error": self.errors[name]}
+            for name in self.components
+        }
+
+    async def warm_up(self) -> None:
+        await asyncio.gather(*(self._warm_up(name) for name in self.components))
+
+    async def _warm_up(self, name: str) -> None:
+        # Keep retrying in the background; an unreachable upstream must not stop the process booting.
+        backoff = 1.0
+        while True:
+            try:
+                await self.components[name]()
+            except Exception as e:
+                self.errors[name] = str(e)
+                logging.warning(f"Warm-up of {name} failed, retrying in {backoff:.0f}s: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            else:
+                self.ready[name] = True
+                self.errors[name] = None
+                logging.info(f"{name} is ready")
+                return
+
+readiness = Readiness()
@@ -0,0 +1,205 @@
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import asyncio
+import httpx
+import logging
+import openai
+import random
+import time
+
+T = TypeVar("T")
+
+# Failures where the request never reached OpenAI, so even a non-idempotent call can be repeated.
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def is_retryable(error: BaseException, idempotent: bool) -> bool:
+    if isinstance(error, openai.RateLimitError):
+        return True
+    if isinstance(error, openai.APIConnectionError) and isinstance(error.__cause__, _NOT_SENT):
+        return True
+    if not idempotent:
+        return False
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"]) if response is not None else None
+    except (KeyError, ValueError):
+        return None
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"Circuit {name} is open")
+        self.name = name
+
+class CircuitBreaker:
+    """Stops sending traffic upstream while it is failing or too slow.
+
+    Closed, it keeps the outcomes of the last `window` calls and opens once
+    enough of them failed or exceeded `slow_call` seconds. Open, callers are
+    expected to fail fast. After `open_seconds` it is half-open: allow() lets
+    one trial request through at a time, and the first outcome recorded then
+    closes or re-opens it.
+    """
+
+    def __init__(self, name: str, window: Optional[int] = None, min_calls: Optional[int] = None,
+                 failure_ratio: Optional[float] = None, slow_call: Optional[float] = None,
+                 slow_ratio: Optional[float] = None, open_seconds: Optional[float] = None):
+        self.name = name
+        self.min_calls = min_calls or settings.OPENAI_BREAKER_MIN_CALLS
+        self.failure_ratio = failure_ratio or settings.OPENAI_BREAKER_FAILURE_RATIO
+        self.slow_call = slow_call or settings.OPENAI_BREAKER_SLOW_CALL
+        self.slow_ratio = slow_ratio or settings.OPENAI_BREAKER_SLOW_RATIO
+        self.open_seconds = open_seconds or settings.OPENAI_BREAKER_OPEN_SECONDS
+        self.outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window or settings.OPENAI_BREAKER_WINDOW)
+        self.opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.open_seconds else "half_open"
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        # A trial that never reported back (cancelled) does not block the next one for ever.
+        now = time.monotonic()
+        if self._trial_at is None or now - self._trial_at >= self.open_seconds:
+            self._trial_at = now
+            return True
+        return False
+
+    def record(self, duration: Optional[float] = None, failed: bool = False) -> None:
+        bad = failed or (duration is not None and duration >= self.slow_call)
+        if self.opened_at is not None:
+            # Stragglers from before opening are ignored; a half-open outcome decides.
+            if self.state == "half_open":
+                if bad:
+                    self._open()
+                else:
+                    self._close()
+            return
+        self.outcomes.append((failed, bad and not failed))
+        if len(self.outcomes) >= self.min_calls:
+            failures = sum(1 for failure, _ in self.outcomes if failure)
+            slow = sum(1 for _, slow in self.outcomes if slow)
+            if failures >= self.failure_ratio * len(self.outcomes) or slow >= self.slow_ratio * len(self.outcomes):
+                self._open()
+
+    def _open(self) -> None:
+        logging.warning(f"Circuit {self.name} opened for {self.open_seconds}s")
+        self.opened_at = time.monotonic()
+        self._trial_at = None
+        self.outcomes.clear()
+        metrics.inc("circuit_opened_total", circuit=self.name)
+        metrics.set_gauge("circuit_open", 1, circuit=self.name)
+
+    def _close(self) -> None:
+        logging.info(f"Circuit {self.name} closed")
+        self.opened_at = None
+        self._trial_at = None
+        metrics.set_gauge("circuit_open", 0, circuit=self.name)
+
+class Resilience:
+    """Retries with jittered backoff and request hedging around short OpenAI calls.
+
+    Every call has an overall deadline. Transient failures are retried only
+    when repeating the call is safe: idempotent calls on any transient error,
+    the others only when OpenAI never saw the request. Idempotent reads may be
+    hedged: if the first attempt is slower than the observed p95 for that call,
+    a second one is sent and whichever finishes first wins. With a breaker,
+    every attempt is reported to it and calls fail fast while it is open.
+    """
+
+    def __init__(self, attempts: Optional[int] = None, deadline: Optional[float] = None, hedge: Optional[bool] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.attempts = attempts or settings.OPENAI_RETRY_ATTEMPTS
+        self.deadline = deadline or settings.OPENAI_CALL_DEADLINE
+        self.hedge = settings.OPENAI_HEDGE_ENABLED if hedge is None else hedge
+        self.breaker = breaker
+
+    async def call(self, name: str, func: Callable[[], Awaitable[T]], idempotent: bool = True, hedge: bool = False) -> T:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.breaker is not None and not self.breaker.allow():
+                metrics.inc("upstream_call_failures_total", call=name)
+                raise CircuitOpen(self.breaker.name)
+            try:
+                remaining = deadline - time.monotonic()
+                if hedge and idempotent and self.hedge:
+                    return await asyncio.wait_for(self._hedged(name, func), remaining)
+                return await asyncio.wait_for(self._attempt(name, func), remaining)
+            except Exception as e:
+                delay = self.backoff(attempt, e)
+                if (attempt >= self.attempts or not is_retryable(e, idempotent)
+                        or time.monotonic() + delay >= deadline):
+                    metrics.inc("upstream_call_failures_total", call=name)
+                    raise
+                metrics.inc("upstream_retries_total", call=name)
+                await asyncio.sleep(delay)
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        # Full jitter, so clients that failed together do not retry together.
+        delay = random.uniform(0, min(settings.OPENAI_RETRY_MAX_DELAY, settings.OPENAI_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+        return max(delay, _retry_after(error) or 0.0)
+
+    def hedge_delay(self, name: str) -> float:
+        histogram = metrics.histogram("upstream_call_seconds", call=name)
+        if histogram is None or histogram.count < settings.OPENAI_HEDGE_MIN_SAMPLES:
+            return settings.OPENAI_HEDGE_DELAY
+        return max(settings.OPENAI_HEDGE_MIN_DELAY, histogram.quantile(0.95))
+
+    async def _attempt(self, name: str, func: Callable[[], Awaitable[T]]) -> T:
+        metrics.inc("upstream_attempts_total", call=name)
+        started = time.perf_counter()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Cut off by the deadline or a faster hedge; at least this slow.
+            self._record(time.perf_counter() - started)
+            raise
+        except Exception as e:
+            self._record(failed=is_retryable(e, True))
+            raise
+        elapsed = time.perf_counter() - started
+        metrics.observe("upstream_call_seconds", elapsed, call=name)
+        self._record(elapsed)
+        return result
+
+    def _record(self, duration: Optional[float] = None, failed: bool = False) -> None:
+        if self.breaker is not None:
+            self.breaker.record(duration, failed)
+
+    async def _hedged(self, name: str, func: Callable[[], Awaitable[T]]) -> T:
+        first = asyncio.ensure_future(self._attempt(name, func))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay(name))
+            if done:
+                return first.result()
+            metrics.inc("upstream_hedges_total", call=name)
+            pending.add(asyncio.ensure_future(self._attempt(name, func)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            metrics.inc("upstream_hedge_wins_total", call=name)
+                        return task.result()
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,26 @@
+from json.encoder import encode_basestring_ascii
+from typing import Dict, Iterable, Optional, Tuple
+import json
+
+# Every chat frame is {"type": ..., "content": <str>}; only the content needs escaping.
+# The output is byte-for-byte what f"data: {json.dumps(frame)}\n\n" produced.
+FRAME_TYPES = ("start", "stream", "tool_call", "tool_call_delta", "error", "timing", "end")
+
+_PREFIXES: Dict[str, bytes] = {
+    frame_type: b'data: {"type": ' + encode_basestring_ascii(frame_type).encode("ascii") + b', "content": '
+    for frame_type in FRAME_TYPES
+}
+_SUFFIX = b"}\n\n"
+
+def encode_frame(frame: dict, event_id: Optional[str] = None) -> bytes:
+    head = b"id: " + event_id.encode("utf-8") + b"\n" if event_id else b""
+    prefix = _PREFIXES.get(frame.get("type"))
+    content = frame.get("content")
+    if prefix is None or len(frame) != 2 or not isinstance(content, str):
+        # Anything outside the fixed schema takes the generic path.
+        return head + b"data: " + json.dumps(frame).encode("ascii") + b"\n\n"
+    return head + prefix + encode_basestring_ascii(content).encode("ascii") + _SUFFIX
+
+def encode_frames(frames: Iterable[Tuple[Optional[str], dict]]) -> bytes:
+    # Several frames in one buffer -> one write to the socket.
+    return b"".join([encode_frame(frame, event_id) for event_id, frame in frames])
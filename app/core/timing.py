@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from backend.app.core.metrics import metrics
+import json
+import logging
+import time
+
+class RequestTiming:
+    """Where the time of one chat run went, stage by stage.
+
+    Spans of the same stage add up (e.g. several tool rounds); marks record the
+    offset of a one-off moment such as the first delta. finish() feeds
+    chat_stage_seconds{stage, model, backend} and writes one structured log line;
+    server_timing() renders the same numbers as a Server-Timing value.
+    """
+
+    def __init__(self, model: str, backend: str = "assistants", **context: str):
+        self.model = model
+        self.backend = backend
+        self.context = context
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.finished: Optional[float] = None
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - started
+
+    def mark(self, stage: str) -> None:
+        if stage not in self.stages:
+            self.stages[stage] = time.perf_counter() - self.started
+
+    def finish(self) -> Dict[str, float]:
+        if self.finished is None:
+            self.finished = time.perf_counter() - self.started
+            for stage, seconds in self.stages.items():
+                metrics.observe("chat_stage_seconds", seconds, stage=stage, model=self.model, backend=self.backend)
+            metrics.observe("chat_stage_seconds", self.finished, stage="total", model=self.model, backend=self.backend)
+            logging.info(json.dumps({"event": "chat_timing", "model": self.model, "backend": self.backend, **self.context,
+                                     **{f"{stage}_ms": ms for stage, ms in self.breakdown().items()}}))
+        return self.breakdown()
+
+    def breakdown(self) -> Dict[str, float]:
+        stages = {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        stages["total"] = round((self.finished if self.finished is not None else time.perf_counter() - self.started) * 1000, 1)
+        return stages
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.breakdown().items())
@@ -1,16 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from backend.app.api import products, cart
 from backend.app.api.routes import chat
 from backend.app.core.config import settings
+from backend.app.core.http_client import pool_stats, upstream_http_client
+from backend.app.core.metrics import metrics
+from backend.app.core.readiness import readiness
+from backend.app.services.tool_call_handler import tool_cache
 from dotenv import load_dotenv
+import asyncio
 
 
 load_dotenv()  # This loads the environment variables from .env
 
-app = FastAPI(title=settings.PROJECT_NAME)
+readiness.register("chat", chat.warm_up)
+readiness.register("caches", chat.warm_up_caches)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    routes = [route.path for route in app.routes]
+    print(f"Registered routes: {routes}")
+    # Warm up in the background so the worker starts serving /health immediately,
+    # even when OpenAI is slow or unreachable; /ready flips once everything is warm.
+    warm_up = asyncio.create_task(readiness.warm_up())
+    yield
+    warm_up.cancel()
+    await chat.shutdown()
+    await upstream_http_client.aclose()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,19 +50,30 @@ app.include_router(cart.router, prefix="/api/cart", tags=["cart"])
 async def root():
     return FileResponse("frontend/dist/index.html")
 
-# Servírování statických souborů
-app.mount("/", StaticFiles(directory="frontend/dist", html=True), name="static")
-
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
-@app.on_event("startup")
-async def startup_event():
-    routes = [route.path for route in app.routes]
-    print(f"Registered routes: {routes}")
+# Readiness probe: 503 until the chat backend and caches are warm
+@app.get("/ready")
+async def readiness_check():
+    status_code = 200 if readiness.is_ready else 503
+    return JSONResponse(
+        {"status": "ready" if readiness.is_ready else "warming_up", "components": readiness.report()},
+        status_code=status_code,
+    )
+
+# In-process metrics (counters, gauges, latency histograms) for sizing and debugging
+@app.get("/metrics")
+async def metrics_snapshot():
+    upstream_pool = pool_stats(upstream_http_client)
+    return {**metrics.snapshot(), "tool_cache": tool_cache.stats(), "response_cache": chat.response_cache.stats(),
+            "upstream_pool": upstream_pool}
+
+# Servírování statických souborů (mounted last so it does not shadow the probes above)
+app.mount("/", StaticFiles(directory="frontend/dist", html=True), name="static")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import time
+
+@dataclass
+class Conversation:
+    id: str
+    user_id: Optional[str] = None
+    # Chat Completions message dicts (system prompt excluded), oldest first.
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # Rolling summary of messages[:summarized_upto], which are no longer sent verbatim.
+    summary: str = ""
+    summarized_upto: int = 0
+    # Caches kept by the context builder: token count per message, and the built prefix.
+    token_counts: List[int] = field(default_factory=list)
+    prefix_key: Optional[Tuple[str, str]] = None
+    prefix: List[Dict[str, Any]] = field(default_factory=list)
+    prefix_tokens: int = 0
@@ -1,78 +1,171 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from backend.app.core.config import settings
+from backend.app.core.http_client import upstream_http_client
+from backend.app.core.resilience import CircuitBreaker, CircuitOpen, Resilience, is_retryable
+from backend.app.services.assistant_registry import AssistantRegistry
+from backend.app.services.tool_call_handler import tool_registry
+import asyncio
+from collections import OrderedDict
+import httpx
 import logging
-from openai import AssistantEventHandler
+from openai import AsyncAssistantEventHandler
+from openai.types.beta.threads import Run
 
 class AIService:
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4-turbo-preview"):
-        self.client = OpenAI(api_key=api_key or settings.OPENAI_API_KEY)
-        self.model = model
-        self.assistant = self.create_assistant()
-
-    def create_assistant(self):
-        return self.client.beta.assistants.create(
-            name="eShop Assistant",
-            instructions="You are an AI assistant for an e-commerce platform. Help users find products, manage their cart, and answer questions about the shopping process.",
-            tools=self.default_tools(),
-            model=self.model
+    backend = "assistants"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4-turbo-preview", http_client: Optional[httpx.AsyncClient] = None):
+        # Async client: no OpenAI call blocks the event loop, so one worker can keep
+        # hundreds of runs in flight, bounded only by the shared connection pool.
+        self.client = AsyncOpenAI(
+            api_key=api_key or settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            http_client=http_client or upstream_http_client,
         )
+        # Short calls are retried by self.resilience, not by the SDK on top of it.
+        self.single_shot = self.client.with_options(max_retries=0)
+        self.breaker = CircuitBreaker("openai")
+        self.resilience = Resilience(breaker=self.breaker)
+        self.model = model
+        self.registry = AssistantRegistry(self.client)
+        self.assistant_id = None
+        self.definition_hash = AssistantRegistry.definition_hash(self.assistant_definition())
+        self._assistant_lock = asyncio.Lock()
+        # Last message id seen per thread, so each turn only fetches what is new.
+        self.thread_cursors: "OrderedDict[str, str]" = OrderedDict()
+
+    async def warm_up(self) -> None:
+        await self.get_assistant_id()
+        await self.prewarm(settings.OPENAI_PREWARM_CONNECTIONS)
+
+    async def prewarm(self, connections: int) -> None:
+        # Cheap authenticated calls that leave DNS, TCP and TLS done and the connections
+        # idle in the pool, so the first chats do not pay for the handshakes.
+        results = await asyncio.gather(*(self.client.models.list() for _ in range(connections)), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if failures and len(failures) == len(results):
+            raise failures[0]
+
+    async def get_assistant_id(self) -> str:
+        if self.assistant_id is None:
+            async with self._assistant_lock:
+                if self.assistant_id is None:
+                    self.assistant_id = await self.registry.resolve(self.assistant_definition())
+        return self.assistant_id
+
+    def assistant_definition(self) -> Dict[str, Any]:
+        return {
+            "name": "eShop Assistant",
+            "instructions": "You are an AI assistant for an e-commerce platform. Help users find products, manage their cart, and answer questions about the shopping process.",
+            "tools": self.default_tools(),
+            "model": self.model,
+        }
 
     def default_tools(self):
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_product_info",
-                    "description": "Get information about a specific product",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_id": {"type": "string", "description": "The ID of the product"}
-                        },
-                        "required": ["product_id"]
-                    }
-                }
-            },
-            # Add other tools here...
-        ]
-
-    def create_thread(self):
-        return self.client.beta.threads.create()
-
-    def add_message_to_thread(self, thread_id: str, role: str, content: str):
-        return self.client.beta.threads.messages.create(
+        # Declared once per tool in ToolCallHandler; see tool_registry.
+        return tool_registry.schemas()
+
+    async def create_thread(self):
+        # Treated as idempotent: a duplicate from a retry is just an unused empty thread.
+        return await self.resilience.call("threads.create", lambda: self.single_shot.beta.threads.create())
+
+    async def add_message_to_thread(self, thread_id: str, role: str, content: str):
+        return await self.resilience.call("messages.create", lambda: self.single_shot.beta.threads.messages.create(
             thread_id=thread_id,
             role=role,
             content=content
-        )
+        ), idempotent=False)
 
-    def run_assistant(self, thread_id: str, instructions: str = None, event_handler=None):
-        with self.client.beta.threads.runs.create_and_stream(
+    async def record_exchange(self, thread_id: str, question: str, answer: str):
+        # For answers served without a run (response cache): the thread must still hold them for later turns.
+        await self.add_message_to_thread(thread_id, "user", question)
+        await self.add_message_to_thread(thread_id, "assistant", answer)
+
+    async def run_assistant(self, thread_id: str, instructions: str = None, event_handler_factory=None, tool_handler=None) -> Run:
+        if not self.breaker.allow():
+            raise CircuitOpen(self.breaker.name)
+        try:
+            run = await self._stream_run(thread_id, instructions, event_handler_factory, tool_handler)
+        except Exception as e:
+            self.breaker.record(failed=is_retryable(e, True))
+            raise
+        self.breaker.record()
+        return run
+
+    async def _stream_run(self, thread_id: str, instructions: Optional[str], event_handler_factory, tool_handler) -> Run:
+        # Streams the run through a fresh handler per stream (the SDK does not allow reuse).
+        # While the run stops in requires_action, all tool calls are executed concurrently
+        # and submitted at once; the continuation streams into the next handler.
+        event_handler_factory = event_handler_factory or AsyncAssistantEventHandler
+        async with self.client.beta.threads.runs.stream(
             thread_id=thread_id,
-            assistant_id=self.assistant.id,
+            assistant_id=await self.get_assistant_id(),
             instructions=instructions,
-            event_handler=event_handler,
+            event_handler=event_handler_factory(),
         ) as stream:
-            stream.until_done()
-            return stream.get_final_run()
+            await stream.until_done()
+            run = await stream.get_final_run()
 
-class EventHandler(AssistantEventHandler):
-    def __init__(self, handle_chunk_func):
-        self.handle_chunk_func = handle_chunk_func
+        while run.status == "requires_action":
+            if tool_handler is None:
+                # Nobody can answer the tool calls; free the thread instead of leaving the run stuck.
+                return await self.resilience.call("runs.cancel", lambda: self.single_shot.beta.threads.runs.cancel(
+                    thread_id=thread_id, run_id=run.id))
+            tool_outputs = await tool_handler.execute_tool_calls(run.required_action.submit_tool_outputs.tool_calls)
+            async with self.client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs,
+                event_handler=event_handler_factory(),
+            ) as stream:
+                await stream.until_done()
+                run = await stream.get_final_run()
+        return run
 
-    def on_text_created(self, text):
-        self.handle_chunk_func({"type": "start", "content": ""})
+    async def get_run_status(self, thread_id: str, run_id: str) -> Run:
+        return await self.resilience.call("runs.retrieve", lambda: self.single_shot.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run_id
+        ), hedge=True)
 
-    def on_text_delta(self, delta, snapshot):
-        self.handle_chunk_func({"type": "stream", "content": delta.value})
+    async def get_messages(self, thread_id: str, after: Optional[str] = None, run_id: Optional[str] = None, order: str = "desc",
+                           limit: Optional[int] = None):
+        params: Dict[str, Any] = {"order": order}
+        if after:
+            params["after"] = after
+        if run_id:
+            params["run_id"] = run_id
+        if limit:
+            params["limit"] = limit
+        return await self.resilience.call("messages.list", lambda: self.single_shot.beta.threads.messages.list(
+            thread_id=thread_id, **params), hedge=True)
 
-    def on_tool_call_created(self, tool_call):
-        self.handle_chunk_func({"type": "tool_call", "content": str(tool_call)})
+    async def count_messages(self, thread_id: str, limit: int) -> Optional[int]:
+        # Messages in the thread, counted up to limit; None when the thread cannot be read.
+        try:
+            page = await self.get_messages(thread_id, limit=limit)
+        except Exception as e:
+            logging.error(f"Error counting messages in thread: {str(e)}")
+            return None
+        return len(page.data)
 
-    def on_tool_call_delta(self, delta, snapshot):
-        self.handle_chunk_func({"type": "tool_call_delta", "content": str(delta)})
+    async def get_new_messages(self, thread_id: str, run_id: Optional[str] = None) -> List[Any]:
+        # Only messages past the thread cursor (and from run_id, if given), oldest first.
+        messages = []
+        page = await self.get_messages(thread_id, after=self.thread_cursors.get(thread_id), run_id=run_id, order="asc")
+        while True:
+            messages.extend(page.data)
+            if not page.has_more:
+                break
+            page = await self.get_messages(thread_id, after=page.data[-1].id, run_id=run_id, order="asc")
+        if messages:
+            self.advance_cursor(thread_id, messages[-1].id)
+        return messages
 
-    def on_end(self):
-        self.handle_chunk_func({"type": "end", "content": ""})
\ No newline at end of file
+    def advance_cursor(self, thread_id: str, message_id: str) -> None:
+        self.thread_cursors[thread_id] = message_id
+        self.thread_cursors.move_to_end(thread_id)
+        while len(self.thread_cursors) > settings.THREAD_CURSOR_CACHE_SIZE:
+            self.thread_cursors.popitem(last=False)
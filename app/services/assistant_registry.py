@@ -0,0 +1,93 @@
+from typing import Any, Dict, Optional
+from backend.app.core.config import settings
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+
+class AssistantRegistry:
+    """Maps an assistant definition hash to a persisted assistant id.
+
+    Workers that start with an unchanged definition reuse the cached id without
+    touching OpenAI; a changed definition updates the existing assistant in place
+    instead of creating a new one.
+    """
+
+    def __init__(self, client, cache_path: Optional[str] = None):
+        self.client = client
+        self.cache_path = cache_path or settings.ASSISTANT_CACHE_PATH
+
+    @staticmethod
+    def definition_hash(definition: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            {key: definition[key] for key in ("model", "instructions", "tools")},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def resolve(self, definition: Dict[str, Any]) -> str:
+        digest = self.definition_hash(definition)
+        # Serialise workers on the cache file so a cold fleet creates one assistant, not N.
+        lock = await asyncio.to_thread(self._lock)
+        try:
+            cache = self._load()
+            cached_id = cache.get(digest)
+            if cached_id and (not settings.ASSISTANT_ID or cached_id == settings.ASSISTANT_ID):
+                return cached_id
+
+            assistant_id = await self._reuse(settings.ASSISTANT_ID or cache.get("latest"), definition, digest)
+            if assistant_id is None:
+                assistant = await self.client.beta.assistants.create(
+                    **definition, metadata={"definition_hash": digest}
+                )
+                assistant_id = assistant.id
+                logging.info(f"Created assistant {assistant_id}")
+
+            # Any other definition cached for this id is stale now that it has been updated.
+            cache = {key: value for key, value in cache.items() if value != assistant_id or key == "latest"}
+            cache[digest] = assistant_id
+            cache["latest"] = assistant_id
+            self._save(cache)
+            return assistant_id
+        finally:
+            await asyncio.to_thread(self._unlock, lock)
+
+    async def _reuse(self, assistant_id: Optional[str], definition: Dict[str, Any], digest: str) -> Optional[str]:
+        if not assistant_id:
+            return None
+        try:
+            assistant = await self.client.beta.assistants.retrieve(assistant_id)
+        except Exception as e:
+            logging.warning(f"Assistant {assistant_id} could not be retrieved: {str(e)}")
+            return None
+        if (assistant.metadata or {}).get("definition_hash") != digest:
+            await self.client.beta.assistants.update(
+                assistant_id, **definition, metadata={"definition_hash": digest}
+            )
+            logging.info(f"Updated assistant {assistant_id} to definition {digest[:12]}")
+        return assistant_id
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, cache: Dict[str, str]) -> None:
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def _lock(self):
+        lock = open(f"{self.cache_path}.lock", "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _unlock(self, lock) -> None:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
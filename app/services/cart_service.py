@@ -1,21 +1,29 @@
 from typing import List, Dict
+import itertools
+
+_cart_ids = itertools.count(1)
 
 class CartService:
     def __init__(self):
         self.cart = {}
+        self.id = next(_cart_ids)
+        self.version = 0  # Bumped on every change; keys cached tool results
 
     def add_to_cart(self, product_id: int, quantity: int = 1):
         if product_id in self.cart:
             self.cart[product_id] += quantity
         else:
             self.cart[product_id] = quantity
+        self.version += 1
 
     def remove_from_cart(self, product_id: int):
         if product_id in self.cart:
             del self.cart[product_id]
+            self.version += 1
 
     def get_cart(self) -> Dict[int, int]:
         return self.cart
 
     def clear_cart(self):
-        self.cart.clear()
\ No newline at end of file
+        self.cart.clear()
+        self.version += 1
\ No newline at end of file
@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from openai import AsyncAssistantEventHandler
+from openai.types.beta.threads import Text, TextDelta
+from openai.types.beta.threads.runs import FunctionToolCall, FunctionToolCallDelta
+from backend.app.core.config import settings
+from backend.app.services.ai_service import AIService
+from backend.app.services.context_builder import ContextBuilder, LLMSummarizer
+from backend.app.services.conversation_service import ConversationService
+import secrets
+
+@dataclass
+class CompletionRun:
+    id: str
+    status: str
+
+class ChatCompletionsService(AIService):
+    """AIService backend on streaming Chat Completions instead of Assistants threads and runs.
+
+    History lives in ConversationService, so a turn is one streaming request
+    (plus one per tool round) instead of message create, run create and
+    message list; ContextBuilder keeps what is sent within a token budget.
+    The stream drives the same event handler callbacks as an assistant run,
+    so the SSE frames are identical.
+    """
+
+    backend = "completions"
+    MAX_TOOL_ROUNDS = 8
+
+    def __init__(self, *args, conversations: Optional[ConversationService] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conversations = conversations or ConversationService()
+        summarizer = LLMSummarizer(self._summarize) if settings.CONTEXT_SUMMARIZER == "llm" else None
+        self.context_builder = ContextBuilder(self.model, summarizer)
+
+    async def warm_up(self) -> None:
+        # No assistant object to resolve; only the connections need warming.
+        await self.prewarm(settings.OPENAI_PREWARM_CONNECTIONS)
+
+    async def create_thread(self):
+        return self.conversations.create_conversation()
+
+    async def add_message_to_thread(self, thread_id: str, role: str, content: str):
+        self.conversations.add_message(thread_id, {"role": role, "content": content})
+
+    async def count_messages(self, thread_id: str, limit: int) -> Optional[int]:
+        # As in an Assistants thread, tool calls and their results are not messages.
+        messages = self.conversations.get_conversation(thread_id).messages
+        return min(sum(1 for m in messages if m["role"] in ("user", "assistant") and m.get("content")), limit)
+
+    async def _stream_run(self, thread_id: str, instructions: Optional[str], event_handler_factory, tool_handler) -> CompletionRun:
+        event_handler_factory = event_handler_factory or AsyncAssistantEventHandler
+        definition = self.assistant_definition()
+        system = definition["instructions"] + (f"\n\n{instructions}" if instructions else "")
+        run = CompletionRun(id=f"run_{secrets.token_urlsafe(12)}", status="in_progress")
+
+        for _ in range(self.MAX_TOOL_ROUNDS):
+            messages = await self.context_builder.build(self.conversations.get_conversation(thread_id), system)
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=definition["tools"],
+                stream=True,
+            )
+            content, tool_calls = await self._relay(stream, event_handler_factory())
+            if not tool_calls:
+                self.conversations.add_message(thread_id, {"role": "assistant", "content": content})
+                run.status = "completed"
+                return run
+            if tool_handler is None:
+                # Same as a stuck assistant run: nobody can answer, so give up on this turn.
+                run.status = "cancelled"
+                return run
+            self.conversations.add_message(thread_id, {
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [tool_call.model_dump(exclude={"function": {"output"}}) for tool_call in tool_calls],
+            })
+            for output in await tool_handler.execute_tool_calls(tool_calls):
+                self.conversations.add_message(thread_id, {"role": "tool", "tool_call_id": output["tool_call_id"],
+                                                           "content": output["output"]})
+        run.status = "incomplete"
+        return run
+
+    async def _summarize(self, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+        completion = await self.resilience.call("chat.completions.summary", lambda: self.single_shot.chat.completions.create(
+            model=self.model, messages=messages, max_tokens=max_tokens))
+        return completion.choices[0].message.content or ""
+
+    async def _relay(self, stream, handler: AsyncAssistantEventHandler):
+        # Translates completion chunks into the assistant stream callbacks ChatEventHandler implements.
+        content = ""
+        tool_calls: Dict[int, FunctionToolCall] = {}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if not content:
+                    await handler.on_text_created(Text(value="", annotations=[]))
+                content += delta.content
+                await handler.on_text_delta(TextDelta(value=delta.content), Text(value=content, annotations=[]))
+            for call_delta in delta.tool_calls or []:
+                function = call_delta.function
+                tool_call = tool_calls.get(call_delta.index)
+                if tool_call is None:
+                    tool_call = tool_calls[call_delta.index] = FunctionToolCall.model_validate({
+                        "id": call_delta.id, "type": "function",
+                        "function": {"name": function.name if function else "", "arguments": "", "output": None},
+                    })
+                    await handler.on_tool_call_created(tool_call)
+                if function and function.arguments:
+                    tool_call.function.arguments += function.arguments
+                    await handler.on_tool_call_delta(FunctionToolCallDelta.model_validate({
+                        "index": call_delta.index, "type": "function", "id": tool_call.id,
+                        "function": {"arguments": function.arguments},
+                    }), tool_call)
+        await handler.on_end()
+        return content, [tool_calls[index] for index in sorted(tool_calls)]
+
+    async def get_new_messages(self, thread_id: str, run_id: Optional[str] = None) -> List[Any]:
+        # Every reply is streamed through the handlers; there is nothing left to fetch.
+        return []
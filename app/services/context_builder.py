@@ -0,0 +1,170 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.models.conversation import Conversation
+import asyncio
+import json
+import logging
+import math
+
+try:
+    import tiktoken
+except ImportError:  # Optional: without it token counts are estimated from characters.
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators the API adds around every message
+
+class TokenCounter:
+    def __init__(self, model: str):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / 4)  # ~4 characters per token for English text
+
+    def message(self, message: Dict[str, Any]) -> int:
+        tokens = MESSAGE_OVERHEAD_TOKENS + self.count(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            tokens += self.count(tool_call["function"]["name"]) + self.count(tool_call["function"]["arguments"])
+        return tokens
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+class LocalSummarizer:
+    """Extractive summary: one short line per folded message, oldest lines dropped past the cap."""
+
+    inline = True
+
+    def __init__(self, counter: TokenCounter, max_tokens: Optional[int] = None):
+        self.counter = counter
+        self.max_tokens = max_tokens or settings.CONTEXT_SUMMARY_TOKENS
+
+    async def fold(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        lines = summary.splitlines()
+        for message in messages:
+            if message["role"] == "user":
+                lines.append(f"- Customer: {_clip(message['content'], 200)}")
+            elif message["role"] == "tool":
+                lines.append(f"- Tool result: {_clip(message['content'], 160)}")
+            elif message.get("tool_calls"):
+                calls = ", ".join(f"{c['function']['name']}({c['function']['arguments']})" for c in message["tool_calls"])
+                lines.append(f"- Looked up: {_clip(calls, 160)}")
+            elif message.get("content"):
+                lines.append(f"- Assistant: {_clip(message['content'], 160)}")
+        while len(lines) > 1 and self.counter.count("\n".join(lines)) > self.max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+class LLMSummarizer:
+    """Asks the model to merge newly folded turns into the existing summary."""
+
+    inline = False  # An extra upstream call; runs after the turn, off the request path.
+    INSTRUCTIONS = ("You maintain a short running summary of a shopping conversation. Merge the new turns into "
+                    "the summary. Keep products, prices, cart changes and open questions; drop small talk.")
+
+    def __init__(self, complete: Callable[[List[Dict[str, Any]], int], Awaitable[str]], max_tokens: Optional[int] = None):
+        self.complete = complete
+        self.max_tokens = max_tokens or settings.CONTEXT_SUMMARY_TOKENS
+
+    async def fold(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        turns = "\n".join(json.dumps(message, ensure_ascii=False) for message in messages)
+        return await self.complete([
+            {"role": "system", "content": self.INSTRUCTIONS},
+            {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nNew turns:\n{turns}"},
+        ], self.max_tokens)
+
+class ContextBuilder:
+    """Builds the messages sent for one turn within a token budget.
+
+    The most recent messages are sent verbatim; older ones are folded into the
+    conversation's rolling summary, only the newly evicted messages at a time.
+    When over budget the window is trimmed to CONTEXT_TRIM_TO of what the
+    budget leaves after the summary cap, so the prefix (system prompt + summary + first kept messages) stays the
+    same for the next few turns. The prefix and per-message token counts are
+    cached on the conversation.
+    """
+
+    def __init__(self, model: str, summarizer=None, budget: Optional[int] = None):
+        self.counter = TokenCounter(model)
+        self.summarizer = summarizer or LocalSummarizer(self.counter)
+        self.budget = budget or settings.CONTEXT_TOKEN_BUDGET
+        self._folding: Dict[str, asyncio.Task] = {}
+
+    async def build(self, conversation: Conversation, system: str) -> List[Dict[str, Any]]:
+        counts = self._token_counts(conversation)
+        start = self._window_start(conversation, counts)
+        if start > conversation.summarized_upto:
+            if self.summarizer.inline:
+                await self._fold(conversation, start)
+            else:
+                # Until the summary catches up, the unfolded messages are still sent verbatim.
+                self._schedule_fold(conversation, start)
+        prefix = self._prefix(conversation, system)
+        metrics.inc("context_builds_total")
+        metrics.inc("context_tokens_total", conversation.prefix_tokens + sum(counts[conversation.summarized_upto:]))
+        return prefix + conversation.messages[conversation.summarized_upto:]
+
+    def _token_counts(self, conversation: Conversation) -> List[int]:
+        counts = conversation.token_counts
+        for message in conversation.messages[len(counts):]:
+            counts.append(self.counter.message(message))
+        return counts
+
+    def _window_start(self, conversation: Conversation, counts: List[int]) -> int:
+        first = conversation.summarized_upto
+        available = self.budget - self.counter.count(conversation.summary)
+        if sum(counts[first:]) <= available:
+            return first
+        # Leave room for the summary to grow to its cap, or the next build would be over budget again.
+        target = (self.budget - self.summarizer.max_tokens) * settings.CONTEXT_TRIM_TO
+        start, kept = len(counts), 0
+        while start > first and kept + counts[start - 1] <= target:
+            start -= 1
+            kept += counts[start]
+        # Start on a customer message: a window must not begin inside a tool exchange.
+        messages = conversation.messages
+        user_starts = [i for i in range(first, len(messages)) if messages[i]["role"] == "user"]
+        later = [i for i in user_starts if i >= start]
+        if later:
+            return later[0]
+        # The current turn alone is over budget; it is still sent whole.
+        return user_starts[-1] if user_starts else first
+
+    async def _fold(self, conversation: Conversation, start: int) -> None:
+        upto = conversation.summarized_upto
+        try:
+            summary = await self.summarizer.fold(conversation.summary, conversation.messages[upto:start])
+        except Exception as e:
+            logging.error(f"Summarising conversation {conversation.id} failed: {str(e)}")
+            return
+        if conversation.summarized_upto == upto:
+            conversation.summary = summary
+            conversation.summarized_upto = start
+            metrics.inc("context_folds_total")
+            metrics.inc("context_messages_folded_total", start - upto)
+
+    def _schedule_fold(self, conversation: Conversation, start: int) -> None:
+        task = self._folding.get(conversation.id)
+        if task is None or task.done():
+            task = self._folding[conversation.id] = asyncio.create_task(self._fold(conversation, start))
+            task.add_done_callback(lambda _: self._folding.pop(conversation.id, None))
+
+    def _prefix(self, conversation: Conversation, system: str) -> List[Dict[str, Any]]:
+        key = (system, conversation.summary)
+        if conversation.prefix_key == key:
+            metrics.inc("context_prefix_cache_hits_total")
+            return list(conversation.prefix)
+        prefix = [{"role": "system", "content": system}]
+        if conversation.summary:
+            prefix.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation.summary}"})
+        conversation.prefix_key, conversation.prefix = key, prefix
+        conversation.prefix_tokens = sum(self.counter.message(message) for message in prefix)
+        return list(prefix)
@@ -1,14 +1,38 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from backend.app.core.config import settings
+from backend.app.models.conversation import Conversation
+import secrets
+import time
+
 class ConversationService:
-    def __init__(self):
-        # Inicializace, pokud je potřeba
-        pass
+    """Chat history kept in the worker, for backends that do not store it upstream.
+
+    Conversations are evicted least recently used beyond max_conversations.
+    """
+
+    def __init__(self, max_conversations: Optional[int] = None):
+        self.max_conversations = max_conversations or settings.CHAT_SESSION_CACHE_SIZE
+        self.conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def create_conversation(self, user_id: Optional[str] = None) -> Conversation:
+        return self._store(Conversation(id=f"conv_{secrets.token_urlsafe(16)}", user_id=user_id))
 
-    def create_conversation(self, user_id):
-        # Logika pro vytvoření nové konverzace
-        pass
+    def get_conversation(self, conversation_id: str) -> Conversation:
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            # Unknown or evicted (e.g. after a restart): start over with an empty history.
+            return self._store(Conversation(id=conversation_id))
+        self.conversations.move_to_end(conversation_id)
+        return conversation
 
-    def add_message(self, conversation_id, message):
-        # Logika pro přidání zprávy do konverzace
-        pass
+    def add_message(self, conversation_id: str, message: Dict[str, Any]) -> None:
+        conversation = self.get_conversation(conversation_id)
+        conversation.messages.append(message)
+        conversation.updated_at = time.time()
 
-    # Další metody podle potřeby
\ No newline at end of file
+    def _store(self, conversation: Conversation) -> Conversation:
+        self.conversations[conversation.id] = conversation
+        while len(self.conversations) > self.max_conversations:
+            self.conversations.popitem(last=False)
+        return conversation
@@ -0,0 +1,28 @@
+from typing import List
+from backend.app.services.tool_call_handler import ToolCallHandler
+import json
+import re
+
+class FallbackResponder:
+    """Templated chat answers from the local catalog, used while the LLM is unavailable.
+
+    Product ids mentioned in the message are looked up with get_product_info;
+    otherwise the message itself is the search_products query.
+    """
+
+    NOTICE = "Our shopping assistant is temporarily unavailable, so here is what I found in the catalog."
+    PRODUCT_ID = re.compile(r"(?:product|produkt|#)\s*#?(\d+)", re.IGNORECASE)
+    WORD = re.compile(r"\w{3,}")
+    MAX_PRODUCTS = 3
+
+    async def answer(self, tool_handler: ToolCallHandler, message: str) -> str:
+        lines: List[str] = [self.NOTICE]
+        product_ids = list(dict.fromkeys(int(match) for match in self.PRODUCT_ID.findall(message)))
+        for product_id in product_ids[:self.MAX_PRODUCTS]:
+            lines.append(await tool_handler.call_tool("get_product_info", json.dumps({"product_id": product_id})))
+        if not product_ids:
+            query = " ".join(self.WORD.findall(message))
+            found = await tool_handler.call_tool("search_products", json.dumps({"query": query}))
+            lines.append(f"Matching products: {found}")
+        lines.append("Please try again in a few minutes for personal help with your order.")
+        return "\n\n".join(lines)
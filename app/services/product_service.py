@@ -7,9 +7,19 @@ class ProductService:
             1: {"id": 1, "name": "Product 1", "price": 10.99},
             2: {"id": 2, "name": "Product 2", "price": 15.99},
         }
+        self.version = 0  # Bump whenever the catalog changes; keys cached tool results
 
     def get_product(self, product_id: int) -> Dict:
         return self.products.get(product_id)
 
     def get_all_products(self) -> List[Dict]:
-        return list(self.products.values())
\ No newline at end of file
+        return list(self.products.values())
+
+    def search_products(self, query: str = "", category: str = "") -> List[Dict]:
+        terms = query.lower().split()
+        category = category.lower()
+        return [
+            product for product in self.products.values()
+            if (not terms or any(term in product["name"].lower() for term in terms))
+            and (not category or category == product.get("category", "").lower())
+        ]
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import math
+import re
+import time
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+# Function words (English and Czech) that may differ between two phrasings of the same question.
+STOPWORDS = frozenset("""
+a an and are as at be can could do does for from have how i in is it me my of on or please the there to
+what when where which who why will with would you your
+a aby ale co do i jak jake jaky je jsou k kde kdy mate muzete na o od pro s se si v ve z za
+""".split())
+
+def normalize(message: str) -> str:
+    # Case, accents, punctuation and spacing do not change the question.
+    decomposed = unicodedata.normalize("NFKD", message.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", stripped).split())
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def embed(normalized: str) -> Dict[str, float]:
+    """Local embedding: unit-length sparse vector of words and in-word character trigrams.
+
+    Whole words weigh more than trigrams, so a different product or place name
+    ("Slovakia" vs "Slovenia") costs more similarity than a different word form.
+    """
+    vector: Dict[str, float] = {}
+    for word in normalized.split():
+        vector[word] = vector.get(word, 0.0) + 1.0
+        for trigram in _trigrams(word):
+            vector[f"#{trigram}"] = vector.get(f"#{trigram}", 0.0) + 0.25
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {feature: weight / norm for feature, weight in vector.items()} if norm else vector
+
+def _subject(normalized: str) -> Tuple[str, ...]:
+    return tuple(word for word in normalized.split() if word not in STOPWORDS)
+
+def _word_similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if a.isdigit() or b.isdigit():
+        return 0.0  # Product ids, quantities: close is not the same
+    x, y = _trigrams(a), _trigrams(b)
+    return len(x & y) / math.sqrt(len(x) * len(y))
+
+def same_subject(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """Every content word on either side has a near-identical counterpart on the other.
+
+    Bag-of-words similarity alone rates "red shoes" close to "blue shoes"; this
+    keeps semantic hits to rephrasings and word forms ("cost"/"costs").
+    """
+    def covered(words, others):
+        return all(any(_word_similarity(word, other) >= 0.6 for other in others) for word in words)
+    return covered(a, b) and covered(b, a)
+
+@dataclass
+class CachedResponse:
+    scope: str
+    question: str  # Normalised
+    subject: Tuple[str, ...]
+    answer: str
+    vector: Dict[str, float]
+    latency: float  # Seconds the original LLM run took
+    expires_at: float
+
+class ResponseCache:
+    """TTL + LRU cache of complete chat answers, looked up before a run is started.
+
+    A hit is either the same normalised question or one whose embedding is at
+    least `threshold` cosine-similar, within the same scope (assistant and
+    instructions version, catalog version) and with the same content words up
+    to word form. Semantic lookups go through an inverted index of the
+    features, so only entries sharing a feature are scored.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, threshold: Optional[float] = None):
+        self.max_entries = max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.RESPONSE_CACHE_TTL
+        self.threshold = threshold or settings.RESPONSE_CACHE_SIMILARITY
+        self.entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self.postings: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def eligible(self, message: str) -> bool:
+        return settings.RESPONSE_CACHE_ENABLED and len(normalize(message).split()) >= settings.RESPONSE_CACHE_MIN_WORDS
+
+    def get(self, scope: str, message: str) -> Optional[CachedResponse]:
+        question = normalize(message)
+        entry, kind = self._exact(scope, question), "exact"
+        if entry is None:
+            entry, kind = self._similar(scope, question), "semantic"
+        if entry is None:
+            self.misses += 1
+            metrics.inc("response_cache_misses_total")
+            return None
+        self.entries.move_to_end((entry.scope, entry.question))
+        self.hits[kind] += 1
+        metrics.inc("response_cache_hits_total", kind=kind)
+        return entry
+
+    def set(self, scope: str, message: str, answer: str, latency: float) -> None:
+        question = normalize(message)
+        if not question or not answer:
+            return
+        key = (scope, question)
+        self._remove(key)
+        vector = embed(question)
+        self.entries[key] = CachedResponse(scope, question, _subject(question), answer, vector, latency, time.monotonic() + self.ttl)
+        for feature in vector:
+            self.postings.setdefault((scope, feature), set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        metrics.set_gauge("response_cache_entries", len(self.entries))
+
+    def record_saved(self, entry: CachedResponse, served_in: float) -> None:
+        saved = max(entry.latency - served_in, 0.0)
+        self.saved_seconds += saved
+        metrics.inc("response_cache_saved_seconds_total", saved)
+
+    def _exact(self, scope: str, question: str) -> Optional[CachedResponse]:
+        return self._live((scope, question))
+
+    def _similar(self, scope: str, question: str) -> Optional[CachedResponse]:
+        vector, subject = embed(question), _subject(question)
+        scores: Dict[Tuple[str, str], float] = {}
+        for feature, weight in vector.items():
+            for key in self.postings.get((scope, feature), ()):
+                scores[key] = scores.get(key, 0.0) + weight * self.entries[key].vector[feature]
+        for key, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            if score < self.threshold:
+                break
+            entry = self._live(key)
+            if entry is not None and same_subject(subject, entry.subject):
+                return entry
+        return None
+
+    def _live(self, key: Tuple[str, str]) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for feature in entry.vector:
+            keys = self.postings.get((entry.scope, feature))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[(entry.scope, feature)]
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.postings.clear()
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import asyncio
+import itertools
+import math
+import time
+
+class Priority(IntEnum):
+    CHECKOUT = 0
+    LOGGED_IN = 1
+    ANONYMOUS = 2
+
+class SchedulerFull(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Run queue {reason}, retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+@dataclass
+class _Waiter:
+    session_id: str
+    priority: Priority
+    seq: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+class RunScheduler:
+    """Admission control in front of assistant runs.
+
+    At most max_concurrent runs are active per worker and at most
+    max_per_session per session. The rest wait in a bounded queue ordered by
+    priority, then arrival. A full queue or an exceeded deadline is
+    rejected straight away with a Retry-After estimate.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_wait: Optional[float] = None, max_per_session: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.RUN_MAX_CONCURRENT
+        self.max_queue = max_queue if max_queue is not None else settings.RUN_QUEUE_MAX
+        self.max_wait = max_wait if max_wait is not None else settings.RUN_QUEUE_MAX_WAIT
+        self.max_per_session = max_per_session or settings.RUN_MAX_PER_SESSION
+        self.active = 0
+        self.active_by_session: Dict[str, int] = {}
+        self.waiters: List[_Waiter] = []
+        self.avg_run_seconds = 10.0
+        self._seq = itertools.count()
+
+    async def acquire(self, session_id: str, priority: Priority = Priority.ANONYMOUS) -> None:
+        if self._eligible(session_id) and not any(self._eligible(w.session_id) for w in self.waiters):
+            self._grant(session_id)
+            metrics.observe("run_queue_wait_seconds", 0.0, priority=priority.name.lower())
+            return
+        if len(self.waiters) >= self.max_queue:
+            self._reject("full")
+
+        waiter = _Waiter(session_id, priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+        self._report()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self.waiters.remove(waiter)
+                self._report()
+                self._reject("deadline")
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release(session_id)
+            else:
+                self.waiters.remove(waiter)
+                self._report()
+            raise
+        metrics.observe("run_queue_wait_seconds", time.monotonic() - waiter.enqueued_at,
+                        priority=priority.name.lower())
+
+    def release(self, session_id: str, run_seconds: Optional[float] = None) -> None:
+        self.active -= 1
+        remaining = self.active_by_session.get(session_id, 1) - 1
+        if remaining:
+            self.active_by_session[session_id] = remaining
+        else:
+            self.active_by_session.pop(session_id, None)
+        if run_seconds is not None:
+            self.avg_run_seconds += 0.1 * (run_seconds - self.avg_run_seconds)
+        self._dispatch()
+        self._report()
+
+    def is_active(self, session_id: str) -> bool:
+        return session_id in self.active_by_session
+
+    def retry_after(self, after: float = 0.0) -> int:
+        # Roughly how long until the queue ahead of a new request has drained,
+        # plus `after` seconds it has to wait before it can even queue.
+        backlog = (len(self.waiters) + 1) / self.max_concurrent
+        return max(1, min(60, math.ceil(after + backlog * self.avg_run_seconds)))
+
+    def check_capacity(self, after: float = 0.0) -> None:
+        # For a request that will only queue after `after` seconds: reject it now if it could not queue today.
+        if len(self.waiters) >= self.max_queue:
+            self._reject("full", after)
+
+    def _eligible(self, session_id: str) -> bool:
+        return (self.active < self.max_concurrent
+                and self.active_by_session.get(session_id, 0) < self.max_per_session)
+
+    def _grant(self, session_id: str) -> None:
+        self.active += 1
+        self.active_by_session[session_id] = self.active_by_session.get(session_id, 0) + 1
+        self._report()
+
+    def _dispatch(self) -> None:
+        # Best priority first, FIFO within a priority, skipping sessions already at their limit.
+        while self.active < self.max_concurrent:
+            eligible = [w for w in self.waiters if self._eligible(w.session_id)]
+            if not eligible:
+                break
+            waiter = min(eligible, key=lambda w: (w.priority, w.seq))
+            self.waiters.remove(waiter)
+            self._grant(waiter.session_id)
+            waiter.future.set_result(None)
+
+    def _reject(self, reason: str, after: float = 0.0) -> None:
+        metrics.inc("runs_rejected_total", reason=reason)
+        raise SchedulerFull(reason, self.retry_after(after))
+
+    def _report(self) -> None:
+        metrics.set_gauge("run_queue_depth", len(self.waiters))
+        metrics.set_gauge("runs_active", self.active)
@@ -0,0 +1,144 @@
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, List, Optional, Set, Tuple
+from backend.app.core.config import settings
+import asyncio
+import secrets
+import time
+
+class RunStream:
+    """Frames produced by one assistant run, numbered and kept in a bounded ring buffer.
+
+    The producer keeps running when a client disconnects, so a reconnect can
+    replay everything after its Last-Event-ID without touching OpenAI. Each
+    connected reader gets a bounded queue; publish() waits for room in it, so a
+    slow reader slows the upstream read instead of growing memory.
+    """
+
+    def __init__(self, stream_id: str, buffer_size: int, queue_size: int, backpressure_timeout: float):
+        self.id = stream_id
+        self.frames: Deque[Tuple[int, dict]] = deque(maxlen=buffer_size)
+        self.seq = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.queue_size = queue_size
+        self.backpressure_timeout = backpressure_timeout
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    async def publish(self, frame: dict) -> None:
+        self.seq += 1
+        item = (self.seq, frame)
+        self.frames.append(item)
+        await self._deliver(item)
+
+    async def close(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        await self._deliver(None)
+
+    async def _deliver(self, item: Optional[Tuple[int, dict]]) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                pass
+            else:
+                continue
+            try:
+                await asyncio.wait_for(queue.put(item), self.backpressure_timeout)
+            except asyncio.TimeoutError:
+                # A stalled reader must not hold the run forever: detach it and
+                # let it catch up from the ring buffer once it reads again.
+                self.subscribers.discard(queue)
+
+    def _attach(self, after: int) -> Tuple[List[Tuple[int, dict]], Optional[asyncio.Queue]]:
+        # No await between the snapshot and attaching, so no frame can fall in between.
+        replay = [(seq, frame) for seq, frame in self.frames if seq > after]
+        if self.done:
+            return replay, None
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return replay, queue
+
+    async def subscribe_batches(self, after: int = 0) -> AsyncIterator[List[Tuple[int, dict]]]:
+        # Yields every frame that is ready at once, so a slow reader catches up in one write.
+        replay, queue = self._attach(after)
+        try:
+            while True:
+                if replay:
+                    # Frames older than the ring buffer are gone; resume from the oldest one kept.
+                    yield replay
+                    after = replay[-1][0]
+                if queue is None:
+                    return
+                batch = []
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                if not batch:
+                    if queue not in self.subscribers:
+                        replay, queue = self._attach(after)
+                        continue
+                    batch.append(await queue.get())
+                replay = [item for item in batch if item is not None and item[0] > after]
+                if batch[-1] is None:
+                    queue = None
+        finally:
+            if queue is not None:
+                self.subscribers.discard(queue)
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[Tuple[int, dict]]:
+        async for batch in self.subscribe_batches(after):
+            for seq, frame in batch:
+                yield seq, frame
+
+class RunStreamRegistry:
+    def __init__(self, buffer_size: Optional[int] = None, ttl: Optional[float] = None, max_streams: Optional[int] = None):
+        self.buffer_size = buffer_size or settings.SSE_REPLAY_BUFFER_SIZE
+        self.queue_size = settings.SSE_SUBSCRIBER_QUEUE_SIZE
+        self.backpressure_timeout = settings.SSE_BACKPRESSURE_TIMEOUT
+        self.ttl = ttl if ttl is not None else settings.SSE_REPLAY_TTL
+        self.max_streams = max_streams or settings.SSE_REPLAY_MAX_STREAMS
+        self.streams: "OrderedDict[str, RunStream]" = OrderedDict()
+
+    def create(self) -> RunStream:
+        self._expire()
+        stream = RunStream(secrets.token_urlsafe(12), self.buffer_size, self.queue_size, self.backpressure_timeout)
+        self.streams[stream.id] = stream
+        return stream
+
+    def start(self, produce: Callable[[RunStream], Awaitable[Any]], stream: Optional[RunStream] = None) -> RunStream:
+        # stream may be created earlier so readers can subscribe before the run begins.
+        stream = stream or self.create()
+
+        async def run():
+            try:
+                await produce(stream)
+            finally:
+                await stream.close()
+
+        stream.task = asyncio.create_task(run())
+        return stream
+
+    def get(self, stream_id: str) -> Optional[RunStream]:
+        self._expire()
+        return self.streams.get(stream_id)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for stream_id, stream in list(self.streams.items()):
+            finished = stream.done and now - stream.finished_at > self.ttl
+            if finished or (len(self.streams) > self.max_streams and stream.done):
+                del self.streams[stream_id]
+
+    @staticmethod
+    def format_event_id(stream: RunStream, seq: int) -> str:
+        return f"{stream.id}:{seq}"
+
+    @staticmethod
+    def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+        if not event_id or ":" not in event_id:
+            return None
+        stream_id, _, seq = event_id.rpartition(":")
+        if not seq.isdigit():
+            return None
+        return stream_id, int(seq)
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.services.run_scheduler import Priority, RunScheduler
+from backend.app.services.run_stream import RunStream, RunStreamRegistry
+import asyncio
+import time
+
+Producer = Callable[[RunStream], Awaitable[None]]
+
+@dataclass
+class _Batch:
+    messages: List[str]
+    instructions: Optional[str]
+    stream: RunStream
+
+@dataclass
+class _Run:
+    started: float
+    done: asyncio.Event
+
+class ThreadActors:
+    """Serialises runs per thread and merges messages that arrive while one is in flight.
+
+    OpenAI allows a single active run per thread. The first message that has to
+    wait opens a batch; every further message for that thread joins it until
+    the batch's run starts, then all of them go upstream as one message and one
+    run. Every sender gets the same RunStream. Waiting for the thread's own run
+    happens here, outside the scheduler, so only the wait for a global slot is
+    subject to the queue deadline.
+    """
+
+    def __init__(self, scheduler: RunScheduler, run_streams: RunStreamRegistry, merge_window_ms: Optional[float] = None):
+        self.scheduler = scheduler
+        self.run_streams = run_streams
+        self.merge_window = (settings.CHAT_MERGE_WINDOW_MS if merge_window_ms is None else merge_window_ms) / 1000
+        self.pending: Dict[str, _Batch] = {}
+        self.running: Dict[str, _Run] = {}
+
+    async def submit(self, thread_id: str, message: str, instructions: Optional[str], priority: Priority,
+                     run: Callable[[RunStream, str, Optional[str]], Awaitable[None]],
+                     answer: Optional[Callable[[str, Optional[str]], Awaitable[Optional[Producer]]]] = None) -> RunStream:
+        # answer, if given, is asked first when the thread is idle: it returns a producer for a reply
+        # that needs no run (e.g. a cached answer), or None. Such a reply holds the thread like a run,
+        # so later messages wait for it, but takes no scheduler slot.
+        batch = self.pending.get(thread_id)
+        if batch is not None:
+            batch.messages.append(message)
+            metrics.inc("chat_messages_merged_total")
+            return batch.stream
+
+        batch = self.pending[thread_id] = _Batch([message], instructions, self.run_streams.create())
+        try:
+            current = self.running.get(thread_id)
+            if current is not None:
+                # Shed now if the queue is full, instead of after the current run.
+                self.scheduler.check_capacity(self.remaining(thread_id))
+                await current.done.wait()
+                if self.merge_window > 0:
+                    # The user is typing while the assistant answers; give follow-ups a moment to join.
+                    await asyncio.sleep(self.merge_window)
+            elif answer is not None:
+                # Messages arriving during the lookup join this batch; merged messages always run.
+                reply = await answer(message, instructions)
+                if reply is not None and len(batch.messages) == 1:
+                    del self.pending[thread_id]
+                    return self._start(thread_id, batch.stream, reply, scheduled=False)
+            await self.scheduler.acquire(thread_id, priority)
+        except BaseException as e:
+            del self.pending[thread_id]
+            if len(batch.messages) > 1:
+                # Senders merged into this batch are already listening; tell them it will not run.
+                await batch.stream.publish({"type": "error", "content": str(e) or "Run was not started"})
+                await batch.stream.publish({"type": "end", "content": ""})
+            await batch.stream.close()
+            raise
+        del self.pending[thread_id]
+        content = "\n\n".join(batch.messages)
+        return self._start(thread_id, batch.stream, lambda stream: run(stream, content, batch.instructions))
+
+    def _start(self, thread_id: str, stream: RunStream, produce: Producer, scheduled: bool = True) -> RunStream:
+        current = self.running[thread_id] = _Run(time.monotonic(), asyncio.Event())
+
+        async def run_and_release(stream: RunStream):
+            try:
+                await produce(stream)
+            finally:
+                if scheduled:
+                    self.scheduler.release(thread_id, time.monotonic() - current.started)
+                del self.running[thread_id]
+                current.done.set()
+
+        return self.run_streams.start(run_and_release, stream)
+
+    def remaining(self, thread_id: str) -> float:
+        # Estimated seconds until the thread's current run ends, from the average run time.
+        current = self.running.get(thread_id)
+        if current is None:
+            return 0.0
+        return max(self.scheduler.avg_run_seconds - (time.monotonic() - current.started), 0.0)
@@ -0,0 +1,75 @@
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import asyncio
+import logging
+import time
+
+class ThreadPool:
+    """Pre-created OpenAI thread ids so /api/chat/start is a local pop.
+
+    Dropping below the low watermark triggers a background refill up to the
+    high watermark, in concurrent batches. Unused threads older than max_age
+    are discarded instead of handed out.
+    """
+
+    def __init__(self, create_thread: Callable[[], Awaitable[str]], low: Optional[int] = None,
+                 high: Optional[int] = None, batch_size: Optional[int] = None, max_age: Optional[float] = None):
+        self.create_thread = create_thread
+        self.low = settings.THREAD_POOL_LOW if low is None else low
+        self.high = settings.THREAD_POOL_HIGH if high is None else high
+        self.batch_size = batch_size or settings.THREAD_POOL_BATCH
+        self.max_age = settings.THREAD_POOL_MAX_AGE if max_age is None else max_age
+        self.threads: Deque[Tuple[float, str]] = deque()
+        self._refill: Optional[asyncio.Task] = None
+
+    async def acquire(self) -> str:
+        self._drop_expired()
+        if self.threads:
+            thread_id = self.threads.popleft()[1]
+            metrics.inc("thread_pool_hits_total")
+        else:
+            metrics.inc("thread_pool_misses_total")
+            thread_id = await self.create_thread()
+        self._report()
+        if len(self.threads) < self.low:
+            self.schedule_refill()
+        return thread_id
+
+    def schedule_refill(self) -> None:
+        if self.high > 0 and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self.refill())
+
+    async def refill(self) -> None:
+        while len(self.threads) < self.high:
+            count = min(self.batch_size, self.high - len(self.threads))
+            results = await asyncio.gather(*(self.create_thread() for _ in range(count)), return_exceptions=True)
+            created = [r for r in results if not isinstance(r, BaseException)]
+            now = time.monotonic()
+            self.threads.extend((now, thread_id) for thread_id in created)
+            self._report()
+            if len(created) < count:
+                logging.warning(f"Thread pool refill created {len(created)}/{count} threads")
+                return
+
+    async def warm_up(self) -> None:
+        await self.refill()
+        if len(self.threads) < self.low:
+            raise RuntimeError(f"Thread pool has {len(self.threads)} threads, below low watermark {self.low}")
+
+    def close(self) -> None:
+        if self._refill is not None:
+            self._refill.cancel()
+
+    def _drop_expired(self) -> None:
+        cutoff = time.monotonic() - self.max_age
+        expired = 0
+        while self.threads and self.threads[0][0] < cutoff:
+            self.threads.popleft()
+            expired += 1
+        if expired:
+            metrics.inc("thread_pool_expired_total", expired)
+
+    def _report(self) -> None:
+        metrics.set_gauge("thread_pool_size", len(self.threads))
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+import threading
+import time
+
+class ToolResultCache:
+    """TTL + LRU memo of read-only tool outputs.
+
+    Keys carry the catalog/cart versions the output was computed from, so a
+    change makes old entries unreachable; they then age out through LRU/TTL.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.TOOL_CACHE_MAX_ENTRIES
+        self.entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Lookups come from the event loop, stores from tool executor threads.
+        self._lock = threading.Lock()
+
+    def get(self, tool_name: str, key: Hashable) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                hit = False
+        metrics.inc("tool_cache_hits_total" if hit else "tool_cache_misses_total", tool=tool_name)
+        return entry[1] if hit else None
+
+    def set(self, key: Hashable, output: str, ttl: float) -> None:
+        with self._lock:
+            self.entries[key] = (time.monotonic() + ttl, output)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            size = len(self.entries)
+        metrics.set_gauge("tool_cache_entries", size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
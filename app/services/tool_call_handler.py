@@ -1,71 +1,140 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pydantic import BaseModel, Field, ValidationError
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.core.timing import RequestTiming
 from backend.app.services.product_service import ProductService
 from backend.app.services.cart_service import CartService
+from backend.app.services.tool_cache import ToolResultCache
+from backend.app.services.tool_registry import Tool, tool_registry
+import asyncio
+import logging
+import time
+
+# Sync tool implementations run here so they never block the event loop.
+tool_executor = ThreadPoolExecutor(max_workers=settings.TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool")
+# Shared by all sessions: product lookups repeat across users, cart results are keyed per cart.
+tool_cache = ToolResultCache()
+
+
+class ProductInfoArgs(BaseModel):
+    product_id: int = Field(description="The ID of the product")
+
+
+class SearchProductsArgs(BaseModel):
+    query: str = Field(description="Search terms")
+    category: str = Field("", description="Optional category filter")
+
+
+class UpdateCartArgs(BaseModel):
+    product_id: int = Field(description="The ID of the product")
+    quantity: int = Field(1, ge=1, description="How many items to add")
+    action: Literal["add", "remove"] = "add"
+
+
+class CartSummaryArgs(BaseModel):
+    pass
 
 
 class ToolCallHandler:
-    def __init__(self, product_service: ProductService, cart_service: CartService):
-        self.tool_outputs: List[Dict[str, str]] = []
+    def __init__(self, product_service: ProductService, cart_service: CartService, timing: Optional[RequestTiming] = None):
+        self.called: List[str] = []  # Tool names this handler dispatched, in order
         self.product_service = product_service
         self.cart_service = cart_service
+        self.timing = timing
+        # One handler per run and one run per thread, so this serialises everything touching the cart.
+        self._cart_lock = asyncio.Lock()
 
-    def handle_tool_call(self, tool_call: Any) -> None:
-        if tool_call.function.name == "get_product_info":
-            product_info = self.get_product_info(tool_call.function.arguments)
-            self.tool_outputs.append({
-                "tool_call_id": tool_call.id,
-                "output": product_info
-            })
-        elif tool_call.function.name == "update_cart":
-            result = self.update_cart(tool_call.function.arguments)
-            self.tool_outputs.append({
-                "tool_call_id": tool_call.id,
-                "output": result
-            })
-        elif tool_call.function.name == "search_products":
-            search_results = self.search_products(tool_call.function.arguments)
-            self.tool_outputs.append({
-                "tool_call_id": tool_call.id,
-                "output": search_results
-            })
-        elif tool_call.function.name == "get_cart_summary":
-            cart_summary = self.get_cart_summary()
-            self.tool_outputs.append({
-                "tool_call_id": tool_call.id,
-                "output": cart_summary
-            })
-
-    def get_product_info(self, arguments: Dict[str, Any]) -> str:
-        product_id = arguments.get("product_id")
-        product = self.product_service.get_product(product_id)
+    async def execute_tool_calls(self, tool_calls: List[Any]) -> List[Dict[str, str]]:
+        # All calls of one requires_action step are started together (cart tools then take turns);
+        # outputs keep the call order.
+        with self.timing.span("tools") if self.timing is not None else nullcontext():
+            return list(await asyncio.gather(*(self.execute_tool_call(tool_call) for tool_call in tool_calls)))
+
+    async def execute_tool_call(self, tool_call: Any) -> Dict[str, str]:
+        return {"tool_call_id": tool_call.id, "output": await self.call_tool(tool_call.function.name, tool_call.function.arguments)}
+
+    async def call_tool(self, name: str, raw_arguments: str) -> str:
+        tool = tool_registry.get(name)
+        if tool is None:
+            return f"Unknown tool: {name}"
+        self.called.append(name)
+        try:
+            arguments = tool.decode(raw_arguments)
+        except ValidationError as e:
+            # Rejected before any service is touched; the model gets the reason and can retry.
+            return f"Invalid arguments for {name}: {e.errors(include_url=False)}"
+        if tool.read_only and not tool.uses_cart:
+            return await self._run(tool, arguments)
+        # Concurrent cart tools would race on the cart and its version, and a summary
+        # could be cached under a version it was not computed from.
+        async with self._cart_lock:
+            return await self._run(tool, arguments)
+
+    async def _run(self, tool: Tool, arguments: BaseModel) -> str:
+        name = tool.name
+        cache_key = self.cache_key(tool, arguments) if tool.cache_ttl > 0 else None
+        if cache_key is not None:
+            output = tool_cache.get(name, cache_key)
+            if output is not None:
+                return output
+        started = time.perf_counter()
+        try:
+            if tool.is_async:
+                output = await tool.func(self, arguments)
+            else:
+                output = await asyncio.get_running_loop().run_in_executor(tool_executor, tool.func, self, arguments)
+        except Exception as e:
+            logging.error(f"Tool {name} failed: {str(e)}")
+            return f"Error: {str(e)}"
+        finally:
+            metrics.observe("tool_seconds", time.perf_counter() - started, tool=name)
+        if cache_key is not None:
+            tool_cache.set(cache_key, output, tool.cache_ttl)
+        return output
+
+    def touched_session(self) -> bool:
+        # True once an output depended on, or changed, this session's cart.
+        return any(tool is None or not tool.read_only or tool.uses_cart for tool in map(tool_registry.get, self.called))
+
+    def cache_key(self, tool: Tool, arguments: BaseModel) -> tuple:
+        # Versions in the key invalidate entries as soon as the catalog or this cart changes.
+        key = (tool.name, arguments.model_dump_json(), self.product_service.version)
+        if tool.uses_cart:
+            key += (self.cart_service.id, self.cart_service.version)
+        return key
+
+    @tool_registry.tool("get_product_info", "Get information about a specific product", ProductInfoArgs,
+                        read_only=True, cache_ttl=settings.TOOL_CACHE_PRODUCT_TTL)
+    def get_product_info(self, arguments: ProductInfoArgs) -> str:
+        product = self.product_service.get_product(arguments.product_id)
         if product:
-            return f"Product: {product.name}, Price: ${product.price}, Description: {product.description}"
+            return f"Product: {product['name']}, Price: ${product['price']}, Description: {product.get('description', '')}"
         return "Product not found"
 
-    def update_cart(self, arguments: Dict[str, Any]) -> str:
-        product_id = arguments.get("product_id")
-        quantity = arguments.get("quantity", 1)
-        action = arguments.get("action", "add")
-        
-        if action == "add":
-            self.cart_service.add_to_cart(product_id, quantity)
-            return f"Added {quantity} of product {product_id} to cart"
-        elif action == "remove":
-            self.cart_service.remove_from_cart(product_id, quantity)
-            return f"Removed {quantity} of product {product_id} from cart"
-        
-        return "Invalid action"
-
-    def search_products(self, arguments: Dict[str, Any]) -> str:
-        query = arguments.get("query", "")
-        category = arguments.get("category", "")
-        products = self.product_service.search_products(query, category)
-        return ", ".join([f"{p.name} (${p.price})" for p in products[:5]])
-
-    def get_cart_summary(self) -> str:
-        cart = self.cart_service.get_cart()
-        total = sum(item.product.price * item.quantity for item in cart.items)
-        return f"Cart: {len(cart.items)} items, Total: ${total:.2f}"
+    @tool_registry.tool("search_products", "Search the catalog by free-text query and optional category", SearchProductsArgs,
+                        read_only=True, cache_ttl=settings.TOOL_CACHE_SEARCH_TTL)
+    def search_products(self, arguments: SearchProductsArgs) -> str:
+        products = self.product_service.search_products(arguments.query, arguments.category)
+        return ", ".join([f"{p['name']} (${p['price']})" for p in products[:5]]) or "No products found"
 
-    def get_tool_outputs(self) -> List[Dict[str, str]]:
-        return self.tool_outputs
\ No newline at end of file
+    @tool_registry.tool("update_cart", "Add a product to the user's cart or remove it", UpdateCartArgs)
+    def update_cart(self, arguments: UpdateCartArgs) -> str:
+        if arguments.action == "add":
+            self.cart_service.add_to_cart(arguments.product_id, arguments.quantity)
+            return f"Added {arguments.quantity} of product {arguments.product_id} to cart"
+        self.cart_service.remove_from_cart(arguments.product_id)
+        return f"Removed product {arguments.product_id} from cart"
+
+    @tool_registry.tool("get_cart_summary", "Summarise the items and total of the user's cart", CartSummaryArgs,
+                        read_only=True, cache_ttl=settings.TOOL_CACHE_CART_TTL, uses_cart=True)
+    def get_cart_summary(self, arguments: CartSummaryArgs) -> str:
+        cart = self.cart_service.get_cart()
+        total = 0.0
+        for product_id, quantity in cart.items():
+            product = self.product_service.get_product(product_id)
+            if product:
+                total += product["price"] * quantity
+        return f"Cart: {sum(cart.values())} items, Total: ${total:.2f}"
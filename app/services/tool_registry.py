@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Type
+from pydantic import BaseModel
+import asyncio
+
+@dataclass
+class Tool:
+    name: str
+    description: str
+    args_model: Type[BaseModel]
+    func: Callable[..., Any]
+    read_only: bool = False
+    cache_ttl: float = 0.0
+    uses_cart: bool = False
+    is_async: bool = False
+    schema: Dict[str, Any] = field(default_factory=dict)
+
+    def decode(self, arguments: Optional[str]) -> BaseModel:
+        # Parses and validates in one pass (pydantic-core); raises ValidationError on bad input.
+        return self.args_model.model_validate_json(arguments or "{}")
+
+class ToolRegistry:
+    """Assistant tools declared once: the args model yields both the JSON schema
+    sent to OpenAI and the validator used before dispatch."""
+
+    def __init__(self):
+        self.tools: Dict[str, Tool] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+
+    def tool(self, name: str, description: str, args_model: Type[BaseModel], read_only: bool = False,
+             cache_ttl: float = 0.0, uses_cart: bool = False):
+        def register(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.tools[name] = Tool(
+                name=name,
+                description=description,
+                args_model=args_model,
+                func=func,
+                read_only=read_only,
+                cache_ttl=cache_ttl if read_only else 0.0,
+                uses_cart=uses_cart,
+                is_async=asyncio.iscoroutinefunction(func),
+                schema={
+                    "type": "function",
+                    "function": {
+                        "name": name,
+                        "description": description,
+                        "parameters": _parameters_schema(args_model),
+                    },
+                },
+            )
+            self._schemas = None
+            return func
+        return register
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self.tools.get(name)
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        if self._schemas is None:
+            self._schemas = [tool.schema for tool in self.tools.values()]
+        return self._schemas
+
+def _parameters_schema(args_model: Type[BaseModel]) -> Dict[str, Any]:
+    schema = args_model.model_json_schema()
+    schema.pop("title", None)
+    for prop in schema.get("properties", {}).values():
+        prop.pop("title", None)
+    schema.setdefault("properties", {})
+    return schema
+
+tool_registry = ToolRegistry()
@@ -0,0 +1,305 @@
+"""End-to-end chat load benchmark: POST /api/chat/start + GET /api/chat/stream at rising concurrency.
+
+By default it starts the OpenAI stand-in and one backend worker (uvicorn) as
+subprocesses, waits for /ready, then runs each concurrency level for a fixed
+duration. Run it from the directory that contains the backend package (and
+frontend/dist, which the app serves):
+
+    python -m backend.benchmarks.chat_load --levels 1,10,50,100,200 --duration 20 --output results.json
+
+Use --target http://host:port (and --worker-pid for CPU/RSS) to measure a
+server that is already running. Per level it reports TTFB (response headers),
+TTFT (first "stream" frame), inter-token latency (gap between "stream" frames,
+after server-side coalescing), full stream time, completed streams/s, errors,
+and the worker's CPU and RSS. The first level whose p99 of --slo-metric exceeds
+--slo-ms, or whose error rate exceeds --max-error-rate, is the breakpoint.
+
+Every simulated chat opens a thread with the same message, so the started
+worker runs with the response cache off; otherwise all but the first chat
+would be cache replays. Pass --response-cache to measure the cache itself.
+A --target server should be started with RESPONSE_CACHE_ENABLED=false for
+the same reason.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"count": len(ordered), "p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99),
+            "max": round(ordered[-1] * 1000, 2)}
+
+
+class ProcessSampler:
+    # Linux /proc, so the benchmark needs no extra dependency; None elsewhere.
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except (OSError, TypeError, IndexError, ValueError):
+            return None
+
+    def rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except (OSError, TypeError):
+            pass
+        return None
+
+
+class LevelStats:
+    def __init__(self):
+        self.start: List[float] = []
+        self.ttfb: List[float] = []
+        self.ttft: List[float] = []
+        self.inter_token: List[float] = []
+        self.total: List[float] = []
+        self.completed = 0
+        self.errors: Dict[str, int] = {}
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def one_chat(client: httpx.AsyncClient, message: str, stats: LevelStats) -> None:
+    started = time.perf_counter()
+    response = await client.post("/api/chat/start")
+    if response.status_code != 200:
+        stats.error(f"start_{response.status_code}")
+        return
+    stats.start.append(time.perf_counter() - started)
+    thread_id = response.json()["thread_id"]
+
+    started = time.perf_counter()
+    async with client.stream("GET", "/api/chat/stream", params={"message": message, "thread_id": thread_id}) as stream:
+        stats.ttfb.append(time.perf_counter() - started)
+        if stream.status_code != 200:
+            await stream.aread()
+            stats.error(f"stream_{stream.status_code}")
+            return
+        last_token = None
+        failed = False
+        async for line in stream.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            frame = json.loads(line[6:])
+            now = time.perf_counter()
+            if frame.get("type") == "stream":
+                if last_token is None:
+                    stats.ttft.append(now - started)
+                else:
+                    stats.inter_token.append(now - last_token)
+                last_token = now
+            elif frame.get("type") == "error":
+                failed = True
+            elif frame.get("type") == "end":
+                break
+    if failed or last_token is None:
+        stats.error("error_frame" if failed else "no_tokens")
+        return
+    stats.total.append(time.perf_counter() - started)
+    stats.completed += 1
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, message: str,
+                    sampler: ProcessSampler, standin_sampler: ProcessSampler, timeout: float) -> dict:
+    stats = LevelStats()
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                try:
+                    await one_chat(client, message, stats)
+                except httpx.HTTPError as e:
+                    stats.error(type(e).__name__)
+
+        cpu_before = (sampler.cpu_seconds(), standin_sampler.cpu_seconds())
+        wall_before = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        cpu_after = (sampler.cpu_seconds(), standin_sampler.cpu_seconds())
+        wall = time.perf_counter() - wall_before
+
+    attempts = stats.completed + sum(stats.errors.values())
+    cpu_percent = [None if before is None or after is None else round((after - before) / wall * 100, 1)
+                   for before, after in zip(cpu_before, cpu_after)]
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(wall, 2),
+        "completed": stats.completed,
+        "streams_per_s": round(stats.completed / wall, 2),
+        "error_rate": round(sum(stats.errors.values()) / attempts, 4) if attempts else 0.0,
+        "errors": stats.errors,
+        "start_ms": percentiles(stats.start),
+        "ttfb_ms": percentiles(stats.ttfb),
+        "ttft_ms": percentiles(stats.ttft),
+        "inter_token_ms": percentiles(stats.inter_token),
+        "total_ms": percentiles(stats.total),
+        "worker_cpu_percent": cpu_percent[0],
+        "worker_rss_mb": sampler.rss_mb(),
+        # A saturated stand-in caps the numbers above; check this before blaming the worker.
+        "standin_cpu_percent": cpu_percent[1],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} not ready after {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def benchmark(args) -> dict:
+    processes = []
+    try:
+        worker_pid, standin_pid = args.worker_pid, None
+        base_url = args.target
+        if base_url is None:
+            standin_port, worker_port = free_port(), free_port()
+            standin = [sys.executable, "-m", "backend.benchmarks.openai_standin", "--port", str(standin_port),
+                       "--latency-ms", str(args.latency_ms), "--first-token-ms", str(args.first_token_ms),
+                       "--tokens-per-sec", str(args.tokens_per_sec), "--reply-tokens", str(args.reply_tokens),
+                       "--error-rate", str(args.error_rate), "--seed", "0"]
+            processes.append(subprocess.Popen(standin))
+            standin_pid = processes[-1].pid
+            await wait_ready(f"http://127.0.0.1:{standin_port}/stand-in/stats", args.startup_timeout)
+
+            env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{standin_port}/v1", OPENAI_API_KEY="stand-in",
+                       CHAT_BACKEND=args.backend, RESPONSE_CACHE_ENABLED=str(args.response_cache).lower(),
+                       ASSISTANT_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "assistant_cache.json"))
+            worker = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.app.main:app",
+                                       "--port", str(worker_port), "--log-level", "warning"], env=env)
+            processes.append(worker)
+            worker_pid = worker.pid
+            base_url = f"http://127.0.0.1:{worker_port}"
+            await wait_ready(f"{base_url}/ready", args.startup_timeout)
+
+        sampler, standin_sampler = ProcessSampler(worker_pid), ProcessSampler(standin_pid)
+        levels, breakpoint = [], None
+        for concurrency in args.levels:
+            result = await run_level(base_url, concurrency, args.duration, args.message,
+                                     sampler, standin_sampler, args.timeout)
+            p99 = result[f"{args.slo_metric}_ms"]["p99"]
+            result["slo_ok"] = p99 is not None and p99 <= args.slo_ms and result["error_rate"] <= args.max_error_rate
+            levels.append(result)
+            print(f"c={concurrency:5d}  {result['streams_per_s']:8.2f} streams/s  "
+                  f"ttft p99={result['ttft_ms']['p99']} ms  ttfb p99={result['ttfb_ms']['p99']} ms  "
+                  f"errors={result['error_rate']:.2%}  cpu={result['worker_cpu_percent']}%  "
+                  f"rss={result['worker_rss_mb']} MB  stand-in cpu={result['standin_cpu_percent']}%", file=sys.stderr)
+            if not result["slo_ok"] and breakpoint is None:
+                breakpoint = concurrency
+                if not args.keep_going:
+                    break
+        return {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "target": args.target or "local stand-in",
+                "backend": None if args.target else args.backend,
+                "response_cache": None if args.target else args.response_cache,
+                "duration_s": args.duration,
+                "message": args.message,
+                "standin": None if args.target else {
+                    "latency_ms": args.latency_ms, "first_token_ms": args.first_token_ms,
+                    "tokens_per_sec": args.tokens_per_sec, "reply_tokens": args.reply_tokens,
+                    "error_rate": args.error_rate,
+                },
+            },
+            "slo": {"metric": args.slo_metric, "p99_ms": args.slo_ms, "max_error_rate": args.max_error_rate,
+                    "breakpoint_concurrency": breakpoint,
+                    "max_ok_concurrency": max((r["concurrency"] for r in levels if r["slo_ok"]), default=None)},
+            "levels": levels,
+        }
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=lambda raw: [int(x) for x in raw.split(",")], default=[1, 10, 50, 100, 200])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument("--message", default="Can you find a product for me?")
+    parser.add_argument("--slo-metric", choices=["ttfb", "ttft", "total"], default="ttft")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 limit for --slo-metric")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="run every level even after the breakpoint")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--target", help="base URL of a running backend instead of starting one")
+    parser.add_argument("--worker-pid", type=int, help="pid to sample CPU/RSS from with --target")
+    parser.add_argument("--backend", choices=["assistants", "completions"], default="assistants",
+                        help="CHAT_BACKEND of the started worker, for A/B runs")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="keep the started worker's response cache on (benchmarks cache replays, not the LLM path)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="stand-in: median non-streaming latency")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="stand-in")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="stand-in")
+    parser.add_argument("--reply-tokens", type=int, default=80, help="stand-in")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stand-in")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
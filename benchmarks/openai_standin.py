@@ -0,0 +1,492 @@
+"""Local stand-in for the subset of the OpenAI Assistants API that AIService uses.
+
+Assistants, threads, messages, streamed and background runs, tool calls and
+submit_tool_outputs, plus streaming Chat Completions with tools (for
+CHAT_BACKEND=completions), with configurable latency, token rate and error injection,
+so the whole chat pipeline can be load-tested offline. Start it from the
+directory that contains the backend package:
+
+    python -m backend.benchmarks.openai_standin --port 8100 --latency-ms 80 --tokens-per-sec 60
+
+then point the backend at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stand-in uvicorn backend.app.main:app
+
+Every option can also be set as STANDIN_<NAME> in the environment. Counters are
+served on GET /stand-in/stats.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 80.0            # median latency of every non-streaming call
+    latency_sigma: float = 0.5          # lognormal spread; 0 makes latency constant
+    spike_rate: float = 0.0             # fraction of calls that take spike_ms on top
+    spike_ms: float = 3000.0
+    first_token_ms: float = 300.0       # run start -> first text delta
+    tokens_per_sec: float = 60.0        # 0 streams the whole answer at once
+    chars_per_token: int = 4
+    reply_tokens: int = 80
+    error_rate: float = 0.0             # fraction of calls answered with error_status
+    error_status: int = 500
+    tool_calls: bool = True             # request tools when the message mentions them
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "StandInConfig":
+        config = cls()
+        for name, value in vars(config).items():
+            raw = os.environ.get(f"STANDIN_{name.upper()}")
+            if raw is None:
+                continue
+            if isinstance(value, bool):
+                setattr(config, name, raw.lower() in ("1", "true", "yes"))
+            elif name == "seed":
+                setattr(config, name, int(raw))
+            else:
+                setattr(config, name, type(value)(raw))
+        return config
+
+
+@dataclass
+class _Thread:
+    id: str
+    created_at: int
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    runs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+_WORDS = (
+    "our shop offers fast delivery and friendly support so you can find the right "
+    "product for every need with great prices and easy returns"
+).split()
+
+
+def create_app(config: Optional[StandInConfig] = None) -> FastAPI:
+    config = config or StandInConfig.from_env()
+    rng = random.Random(config.seed)
+    ids = itertools.count(1)
+    assistants: Dict[str, Dict[str, Any]] = {}
+    threads: Dict[str, _Thread] = {}
+    stats = {"requests": 0, "errors": 0, "runs": 0, "completions": 0, "tool_calls": 0}
+
+    app = FastAPI(title="OpenAI stand-in")
+    app.state.config = config
+    app.state.stats = stats
+
+    def new_id(prefix: str) -> str:
+        return f"{prefix}_{next(ids):012d}"
+
+    def now() -> int:
+        return int(time.time())
+
+    async def latency(median_ms: float) -> None:
+        if median_ms <= 0:
+            return
+        if config.latency_sigma > 0:
+            median_ms = rng.lognormvariate(0, config.latency_sigma) * median_ms
+        if config.spike_rate and rng.random() < config.spike_rate:
+            median_ms += config.spike_ms
+        await asyncio.sleep(median_ms / 1000)
+
+    @app.exception_handler(HTTPException)
+    async def openai_error(request: Request, exc: HTTPException):
+        # The SDK reads {"error": {...}}, like the real API returns.
+        detail = exc.detail if isinstance(exc.detail, dict) else {"message": str(exc.detail)}
+        return JSONResponse({"error": {"type": "invalid_request_error", "code": None, **detail}},
+                            status_code=exc.status_code)
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        stats["requests"] += 1
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            await latency(config.latency_ms)
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+                status_code=config.error_status,
+            )
+        return await call_next(request)
+
+    def get_thread(thread_id: str) -> _Thread:
+        thread = threads.get(thread_id)
+        if thread is None:
+            raise HTTPException(404, detail={"message": f"No thread found with id '{thread_id}'."})
+        return thread
+
+    def thread_json(thread: _Thread) -> Dict[str, Any]:
+        return {"id": thread.id, "object": "thread", "created_at": thread.created_at,
+                "metadata": {}, "tool_resources": {}}
+
+    def message_json(thread_id: str, role: str, text: str, run_id=None, assistant_id=None,
+                     status: str = "completed") -> Dict[str, Any]:
+        return {
+            "id": new_id("msg"), "object": "thread.message", "created_at": now(),
+            "thread_id": thread_id, "role": role, "status": status,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "run_id": run_id, "assistant_id": assistant_id, "attachments": [], "metadata": {},
+            "completed_at": None, "incomplete_at": None, "incomplete_details": None,
+        }
+
+    def run_json(thread: _Thread, assistant: Dict[str, Any], instructions) -> Dict[str, Any]:
+        return {
+            "id": new_id("run"), "object": "thread.run", "created_at": now(),
+            "thread_id": thread.id, "assistant_id": assistant["id"], "status": "queued",
+            "required_action": None, "last_error": None, "model": assistant["model"],
+            "instructions": instructions or assistant["instructions"], "tools": assistant["tools"],
+            "metadata": {}, "usage": None, "temperature": 1.0, "top_p": 1.0,
+            "tool_choice": "auto", "parallel_tool_calls": True, "response_format": "auto",
+            "truncation_strategy": {"type": "auto", "last_messages": None},
+            "incomplete_details": None, "max_prompt_tokens": None,
+            "max_completion_tokens": None, "started_at": None, "completed_at": None,
+            "cancelled_at": None, "failed_at": None, "expires_at": None,
+        }
+
+    def reply_text(prompt: str, tool_outputs: Optional[List[str]] = None) -> str:
+        words = [rng.choice(_WORDS) for _ in range(config.reply_tokens)]
+        text = " ".join(words).capitalize() + "."
+        if tool_outputs:
+            text = "Here is what I found: " + " | ".join(tool_outputs) + ". " + text
+        return text
+
+    def planned_tool_calls(prompt: str, assistant: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not config.tool_calls:
+            return []
+        available = {tool["function"]["name"] for tool in assistant["tools"] if tool.get("type") == "function"}
+        calls = []
+        lowered = prompt.lower()
+        product_ids = re.findall(r"\b(\d+)\b", prompt)
+        if "get_product_info" in available and "product" in lowered and product_ids:
+            for product_id in product_ids[:3]:
+                calls.append(("get_product_info", {"product_id": int(product_id)}))
+        if "search_products" in available and ("search" in lowered or "find" in lowered):
+            calls.append(("search_products", {"query": prompt[:40]}))
+        if "get_cart_summary" in available and "cart" in lowered:
+            calls.append(("get_cart_summary", {}))
+        return [
+            {"id": new_id("call"), "type": "function",
+             "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for name, arguments in calls
+        ]
+
+    def public(run: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in run.items() if not k.startswith("_")}
+
+    def sse(event: str, data: Any) -> str:
+        payload = data if isinstance(data, str) else json.dumps(data)
+        return f"event: {event}\ndata: {payload}\n\n"
+
+    def chunked(text: str):
+        size = max(1, config.chars_per_token)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    async def run_events(thread: _Thread, run: Dict[str, Any], prompt: str,
+                         tool_outputs: Optional[List[str]] = None):
+        if tool_outputs is None:
+            yield sse("thread.run.created", run)
+            run["status"] = "queued"
+            yield sse("thread.run.queued", run)
+        run["status"] = "in_progress"
+        run["started_at"] = run["started_at"] or now()
+        yield sse("thread.run.in_progress", run)
+        await latency(config.first_token_ms)
+
+        assistant = assistants[run["assistant_id"]]
+        calls = planned_tool_calls(prompt, assistant) if tool_outputs is None else []
+        if calls:
+            stats["tool_calls"] += len(calls)
+            step = {
+                "id": new_id("step"), "object": "thread.run.step", "created_at": now(),
+                "run_id": run["id"], "assistant_id": run["assistant_id"], "thread_id": thread.id,
+                "type": "tool_calls", "status": "in_progress", "cancelled_at": None,
+                "completed_at": None, "expired_at": None, "failed_at": None, "last_error": None,
+                "metadata": {}, "usage": None,
+                "step_details": {"type": "tool_calls", "tool_calls": []},
+            }
+            yield sse("thread.run.step.created", step)
+            for index, call in enumerate(calls):
+                delta = {"id": step["id"], "object": "thread.run.step.delta", "delta": {
+                    "step_details": {"type": "tool_calls", "tool_calls": [{
+                        "index": index, "id": call["id"], "type": "function",
+                        "function": {"name": call["function"]["name"],
+                                     "arguments": call["function"]["arguments"], "output": None},
+                    }]}}}
+                yield sse("thread.run.step.delta", delta)
+            run["status"] = "requires_action"
+            run["required_action"] = {"type": "submit_tool_outputs",
+                                      "submit_tool_outputs": {"tool_calls": calls}}
+            run["_prompt"] = prompt
+            yield sse("thread.run.requires_action", public(run))
+            yield sse("done", "[DONE]")
+            return
+
+        text = reply_text(prompt, tool_outputs)
+        message = message_json(thread.id, "assistant", "", run["id"], run["assistant_id"], "in_progress")
+        message["content"] = []
+        thread.messages.append(message)
+        yield sse("thread.message.created", message)
+        yield sse("thread.message.in_progress", message)
+        delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        pieces = chunked(text) if delay else [text]
+        for piece in pieces:
+            yield sse("thread.message.delta", {
+                "id": message["id"], "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text",
+                                       "text": {"value": piece, "annotations": []}}]},
+            })
+            if delay:
+                await asyncio.sleep(delay)
+        message["content"] = [{"type": "text", "text": {"value": text, "annotations": []}}]
+        message["status"] = "completed"
+        message["completed_at"] = now()
+        yield sse("thread.message.completed", message)
+        run["status"] = "completed"
+        run["completed_at"] = now()
+        run["required_action"] = None
+        run["usage"] = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(pieces),
+                        "total_tokens": len(prompt) // 4 + 1 + len(pieces)}
+        yield sse("thread.run.completed", public(run))
+        yield sse("done", "[DONE]")
+
+    async def complete_in_background(thread: _Thread, run: Dict[str, Any], prompt: str,
+                                     tool_outputs: Optional[List[str]] = None) -> None:
+        async for _ in run_events(thread, run, prompt, tool_outputs):
+            pass
+
+    @app.get("/v1/models")
+    async def list_models():
+        await latency(config.latency_ms)
+        return {"object": "list", "data": [{"id": "gpt-4-turbo-preview", "object": "model",
+                                            "created": 0, "owned_by": "stand-in"}]}
+
+    @app.post("/v1/assistants")
+    async def create_assistant(request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        assistant = {
+            "id": new_id("asst"), "object": "assistant", "created_at": now(),
+            "name": body.get("name"), "description": body.get("description"),
+            "model": body["model"], "instructions": body.get("instructions"),
+            "tools": body.get("tools", []), "metadata": body.get("metadata") or {},
+            "top_p": 1.0, "temperature": 1.0, "response_format": "auto", "tool_resources": {},
+        }
+        assistants[assistant["id"]] = assistant
+        return assistant
+
+    @app.get("/v1/assistants/{assistant_id}")
+    async def retrieve_assistant(assistant_id: str):
+        await latency(config.latency_ms)
+        if assistant_id not in assistants:
+            raise HTTPException(404, detail={"message": f"No assistant found with id '{assistant_id}'."})
+        return assistants[assistant_id]
+
+    @app.post("/v1/assistants/{assistant_id}")
+    async def update_assistant(assistant_id: str, request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        if assistant_id not in assistants:
+            raise HTTPException(404, detail={"message": f"No assistant found with id '{assistant_id}'."})
+        assistants[assistant_id].update({k: v for k, v in body.items() if v is not None})
+        return assistants[assistant_id]
+
+    @app.post("/v1/threads")
+    async def create_thread():
+        await latency(config.latency_ms)
+        thread = _Thread(id=new_id("thread"), created_at=now())
+        threads[thread.id] = thread
+        return thread_json(thread)
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        if any(run["status"] in ("queued", "in_progress", "requires_action") for run in thread.runs.values()):
+            raise HTTPException(400, detail={"message": "Can't add messages to thread while a run is active."})
+        content = body["content"]
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        message = message_json(thread_id, body.get("role", "user"), content)
+        thread.messages.append(message)
+        return message
+
+    @app.get("/v1/threads/{thread_id}/messages")
+    async def list_messages(thread_id: str, request: Request):
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        params = request.query_params
+        limit = int(params.get("limit", 20))
+        messages = list(thread.messages)
+        if params.get("run_id"):
+            messages = [m for m in messages if m["run_id"] == params["run_id"]]
+        if params.get("order", "desc") == "desc":
+            messages.reverse()
+        if params.get("after"):
+            position = next((i for i, m in enumerate(messages) if m["id"] == params["after"]), None)
+            messages = messages[position + 1:] if position is not None else messages
+        page = messages[:limit]
+        return {"object": "list", "data": page,
+                "first_id": page[0]["id"] if page else None,
+                "last_id": page[-1]["id"] if page else None,
+                "has_more": len(messages) > limit}
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        assistant = assistants.get(body.get("assistant_id"))
+        if assistant is None:
+            raise HTTPException(404, detail={"message": "No assistant found."})
+        if any(run["status"] in ("queued", "in_progress", "requires_action") for run in thread.runs.values()):
+            raise HTTPException(400, detail={"message": f"Thread {thread_id} already has an active run."})
+        stats["runs"] += 1
+        run = run_json(thread, assistant, body.get("instructions"))
+        thread.runs[run["id"]] = run
+        user_messages = [m for m in thread.messages if m["role"] == "user"]
+        prompt = user_messages[-1]["content"][0]["text"]["value"] if user_messages else ""
+        if body.get("stream"):
+            return StreamingResponse(run_events(thread, run, prompt), media_type="text/event-stream")
+        asyncio.get_running_loop().create_task(complete_in_background(thread, run, prompt))
+        return public(run)
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        if run_id not in thread.runs:
+            raise HTTPException(404, detail={"message": f"No run found with id '{run_id}'."})
+        return public(thread.runs[run_id])
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/submit_tool_outputs")
+    async def submit_tool_outputs(thread_id: str, run_id: str, request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        run = thread.runs.get(run_id)
+        if run is None or run["status"] != "requires_action":
+            raise HTTPException(400, detail={"message": "Run is not waiting for tool outputs."})
+        expected = {call["id"] for call in run["required_action"]["submit_tool_outputs"]["tool_calls"]}
+        outputs = body.get("tool_outputs", [])
+        if {output["tool_call_id"] for output in outputs} != expected:
+            raise HTTPException(400, detail={"message": "Tool outputs do not match the requested tool calls."})
+        run["required_action"] = None
+        run["status"] = "queued"
+        texts = [str(output.get("output", "")) for output in outputs]
+        if body.get("stream"):
+            return StreamingResponse(run_events(thread, run, run.get("_prompt", ""), texts),
+                                     media_type="text/event-stream")
+        asyncio.get_running_loop().create_task(complete_in_background(thread, run, run.get("_prompt", ""), texts))
+        return public(run)
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/cancel")
+    async def cancel_run(thread_id: str, run_id: str):
+        await latency(config.latency_ms)
+        thread = get_thread(thread_id)
+        run = thread.runs.get(run_id)
+        if run is None:
+            raise HTTPException(404, detail={"message": f"No run found with id '{run_id}'."})
+        if run["status"] not in ("queued", "in_progress", "requires_action"):
+            raise HTTPException(400, detail={"message": f"Cannot cancel run with status '{run['status']}'."})
+        run.update(status="cancelled", cancelled_at=now(), required_action=None)
+        return public(run)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await latency(config.latency_ms)
+        stats["completions"] += 1
+        messages = body.get("messages", [])
+        user_messages = [m for m in messages if m.get("role") == "user"]
+        prompt = str(user_messages[-1]["content"]) if user_messages else ""
+        # Right after tool results the model answers; otherwise it may ask for tools first.
+        tool_outputs = None
+        if messages and messages[-1].get("role") == "tool":
+            tool_outputs = []
+            for message in reversed(messages):
+                if message.get("role") != "tool":
+                    break
+                tool_outputs.insert(0, str(message.get("content", "")))
+        calls = [] if tool_outputs is not None else planned_tool_calls(prompt, {"tools": body.get("tools") or []})
+        stats["tool_calls"] += len(calls)
+        completion_id, created, model = new_id("chatcmpl"), now(), body.get("model", "gpt-4-turbo-preview")
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        async def events():
+            await latency(config.first_token_ms)
+            yield chunk({"role": "assistant", "content": ""})
+            if calls:
+                for index, call in enumerate(calls):
+                    yield chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                                 "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                    yield chunk({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]})
+                yield chunk({}, "tool_calls")
+            else:
+                delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+                text = reply_text(prompt, tool_outputs)
+                for piece in chunked(text) if delay else [text]:
+                    yield chunk({"content": piece})
+                    if delay:
+                        await asyncio.sleep(delay)
+                yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        if body.get("stream"):
+            return StreamingResponse(events(), media_type="text/event-stream")
+        await latency(config.first_token_ms)
+        message: Dict[str, Any] = {"role": "assistant", "content": None if calls else reply_text(prompt, tool_outputs)}
+        if calls:
+            message["tool_calls"] = calls
+        return {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message, "logprobs": None,
+                             "finish_reason": "tool_calls" if calls else "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": config.reply_tokens,
+                          "total_tokens": len(prompt) // 4 + 1 + config.reply_tokens}}
+
+    @app.get("/stand-in/stats")
+    async def get_stats():
+        return dict(stats, threads=len(threads), assistants=len(assistants))
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    defaults = StandInConfig.from_env()
+    for name, value in vars(defaults).items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(value, bool):
+            parser.add_argument(flag, type=lambda raw: raw.lower() in ("1", "true", "yes"), default=value)
+        elif name == "seed":
+            parser.add_argument(flag, type=int, default=value)
+        else:
+            parser.add_argument(flag, type=type(value), default=value)
+    args = parser.parse_args()
+    config = StandInConfig(**{name: getattr(args, name) for name in vars(defaults)})
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Microbenchmark: pre-encoded SSE frames vs. json.dumps + f-string per frame.
+
+Run from the directory that contains the backend package:
+
+    python -m backend.benchmarks.sse_encoder --frames 10000 --batch 8
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from backend.app.core.sse import encode_frame, encode_frames
+
+
+def legacy_encode(event_id, frame):
+    # What event_generator did before: format a str, then Starlette encodes it.
+    return f"id: {event_id}\ndata: {json.dumps(frame)}\n\n".encode("utf-8")
+
+
+def make_frames(count, seed):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + "      .,!?\"\\\néáčřž"
+    frames = []
+    for seq in range(1, count + 1):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+        frames.append((f"Zq3xRkP0sL9w:{seq}", {"type": "stream", "content": text}))
+    return frames
+
+
+def measure(label, func, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return label, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=10000, help="frames per round (one second of traffic at the target rate)")
+    parser.add_argument("--batch", type=int, default=8, help="frames joined into one write by encode_frames")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.seed)
+    for event_id, frame in frames:
+        assert encode_frame(frame, event_id) == legacy_encode(event_id, frame)
+    batches = [frames[i:i + args.batch] for i in range(0, len(frames), args.batch)]
+
+    results = [
+        measure("json.dumps + f-string", lambda: [legacy_encode(i, f) for i, f in frames], args.rounds),
+        measure("encode_frame", lambda: [encode_frame(f, i) for i, f in frames], args.rounds),
+        measure(f"encode_frames (batch={args.batch})", lambda: [encode_frames(b) for b in batches], args.rounds),
+    ]
+
+    baseline = results[0][1]
+    print(f"{args.frames} frames per round, best of {args.rounds}")
+    for label, elapsed in results:
+        # CPU share of one core spent encoding at the configured rate (frames per second).
+        print(
+            f"{label:32s} {elapsed * 1e3:8.2f} ms  {args.frames / elapsed:12,.0f} frames/s  "
+            f"{elapsed * 100:6.2f}% core  x{baseline / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+
+# Settings need a key at import time; no test talks to OpenAI (the stand-in runs in-process).
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from backend.app.core.config import settings  # noqa: E402
+from backend.benchmarks.openai_standin import StandInConfig, create_app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def standin():
+    """OpenAI stand-in app with fast, deterministic replies."""
+    return create_app(StandInConfig(latency_ms=1, latency_sigma=0, first_token_ms=1, tokens_per_sec=0,
+                                    reply_tokens=5, seed=1))
+
+
+@pytest.fixture
+def standin_client(standin, monkeypatch, tmp_path):
+    """httpx client wired to the stand-in, for AIService(http_client=...)."""
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", "http://standin/v1")
+    monkeypatch.setattr(settings, "ASSISTANT_CACHE_PATH", str(tmp_path / "assistant_cache.json"))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(standin))
@@ -0,0 +1,75 @@
+import pytest
+from backend.app.core.config import settings
+from backend.app.core.event_handler import ChatEventHandler
+from backend.app.core.resilience import CircuitOpen
+from backend.app.services.ai_service import AIService
+from backend.app.services.cart_service import CartService
+from backend.app.services.chat_completions_service import ChatCompletionsService
+from backend.app.services.product_service import ProductService
+from backend.app.services.tool_call_handler import ToolCallHandler
+
+pytestmark = pytest.mark.anyio
+
+
+async def run_turn(service: AIService, thread_id: str, message: str):
+    frames = []
+
+    async def send(frame: dict):
+        frames.append(frame)
+
+    tool_handler = ToolCallHandler(ProductService(), CartService())
+    await service.add_message_to_thread(thread_id, "user", message)
+    run = await service.run_assistant(thread_id, None, lambda: ChatEventHandler(send), tool_handler)
+    return run, frames, tool_handler
+
+
+@pytest.mark.parametrize("service_class", [AIService, ChatCompletionsService])
+async def test_run_streams_the_reply_and_answers_tool_calls(standin, standin_client, service_class):
+    service = service_class(http_client=standin_client)
+    thread = await service.create_thread()
+
+    run, frames, tool_handler = await run_turn(service, thread.id, "Tell me about product 2")
+
+    assert run.status == "completed"
+    assert tool_handler.called == ["get_product_info"]
+    assert {"tool_call", "start"} <= {frame["type"] for frame in frames}
+    text = "".join(frame["content"] for frame in frames if frame["type"] == "stream")
+    assert "Product 2" in text
+    assert standin.state.stats["tool_calls"] == 1
+
+
+@pytest.mark.parametrize("service_class", [AIService, ChatCompletionsService])
+async def test_count_messages_ignores_tool_calls(standin_client, service_class):
+    service = service_class(http_client=standin_client)
+    thread = await service.create_thread()
+    assert await service.count_messages(thread.id, 1) == 0
+
+    await run_turn(service, thread.id, "Tell me about product 2")
+    assert await service.count_messages(thread.id, 3) == 2
+    await run_turn(service, thread.id, "Thanks")
+    assert await service.count_messages(thread.id, 3) == 3
+
+async def test_completions_history_is_kept_locally(standin, standin_client):
+    service = ChatCompletionsService(http_client=standin_client)
+    thread = await service.create_thread()
+
+    await run_turn(service, thread.id, "Hello there")
+    await run_turn(service, thread.id, "And again")
+
+    roles = [message["role"] for message in service.conversations.get_conversation(thread.id).messages]
+    assert roles == ["user", "assistant", "user", "assistant"]
+    assert standin.state.stats["runs"] == 0 and standin.state.stats["completions"] == 2
+
+
+async def test_open_circuit_fails_fast_without_calling_upstream(standin, standin_client):
+    service = AIService(http_client=standin_client)
+    thread = await service.create_thread()
+    for _ in range(settings.OPENAI_BREAKER_MIN_CALLS):
+        service.breaker.record(failed=True)
+    requests = standin.state.stats["requests"]
+
+    with pytest.raises(CircuitOpen):
+        await service.add_message_to_thread(thread.id, "user", "Hello")
+    with pytest.raises(CircuitOpen):
+        await service.run_assistant(thread.id)
+    assert standin.state.stats["requests"] == requests
@@ -0,0 +1,81 @@
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+from backend.app.core.config import settings
+from backend.app.services.assistant_registry import AssistantRegistry
+
+pytestmark = pytest.mark.anyio
+
+DEFINITION = {"name": "eShop Assistant", "instructions": "Help shoppers.", "tools": [], "model": "gpt-4-turbo-preview"}
+
+
+class FakeAssistants:
+    def __init__(self):
+        self.calls = []
+        self.stored = {}
+        self.ids = count(1)
+
+    async def create(self, **definition):
+        self.calls.append("create")
+        assistant = SimpleNamespace(id=f"asst_{next(self.ids)}", metadata=definition["metadata"])
+        self.stored[assistant.id] = assistant
+        return assistant
+
+    async def retrieve(self, assistant_id):
+        self.calls.append("retrieve")
+        return self.stored[assistant_id]
+
+    async def update(self, assistant_id, **definition):
+        self.calls.append("update")
+        self.stored[assistant_id].metadata = definition["metadata"]
+        return self.stored[assistant_id]
+
+
+@pytest.fixture
+def assistants():
+    return FakeAssistants()
+
+
+@pytest.fixture
+def registry(assistants, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ASSISTANT_ID", None)
+    client = SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+    return lambda: AssistantRegistry(client, str(tmp_path / "assistant_cache.json"))
+
+
+def test_hash_covers_model_instructions_and_tools_only():
+    reordered = dict(reversed(list(DEFINITION.items())))
+    assert AssistantRegistry.definition_hash(reordered) == AssistantRegistry.definition_hash(DEFINITION)
+    assert AssistantRegistry.definition_hash({**DEFINITION, "name": "Other"}) == AssistantRegistry.definition_hash(DEFINITION)
+    assert AssistantRegistry.definition_hash({**DEFINITION, "instructions": "x"}) != AssistantRegistry.definition_hash(DEFINITION)
+
+
+async def test_unchanged_definition_is_reused_without_calls(registry, assistants):
+    first = await registry().resolve(DEFINITION)
+    assert assistants.calls == ["create"]
+
+    # Another worker with the same definition: served from the shared cache file.
+    assert await registry().resolve(DEFINITION) == first
+    assert assistants.calls == ["create"]
+
+
+async def test_changed_definition_updates_the_assistant_in_place(registry, assistants):
+    first = await registry().resolve(DEFINITION)
+    changed = {**DEFINITION, "instructions": "Help shoppers politely."}
+
+    assert await registry().resolve(changed) == first
+    assert assistants.calls == ["create", "retrieve", "update"]
+    assert assistants.stored[first].metadata["definition_hash"] == AssistantRegistry.definition_hash(changed)
+    # Back to a definition the assistant no longer has: it must be updated again, not taken from the cache.
+    await registry().resolve(DEFINITION)
+    assert assistants.calls[-1] == "update"
+
+
+async def test_missing_assistant_is_recreated(registry, assistants):
+    first = await registry().resolve(DEFINITION)
+    assistants.stored.clear()
+
+    second = await registry().resolve({**DEFINITION, "instructions": "New."})
+    assert second != first
+    assert assistants.calls[-1] == "create"
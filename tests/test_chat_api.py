@@ -0,0 +1,149 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.app.api.routes import chat
+from backend.app.core.config import settings
+from backend.app.services.ai_service import AIService
+from backend.app.services.response_cache import ResponseCache
+from backend.app.services.thread_pool import ThreadPool
+
+
+def parse_sse(body: str):
+    frames = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "data" in fields:
+            frames.append({**json.loads(fields["data"]), "id": fields.get("id")})
+    return frames
+
+
+@pytest.fixture
+def app(standin_client, monkeypatch):
+    monkeypatch.setattr(chat, "ai_service", AIService(http_client=standin_client))
+    # Module state of the router, fresh for every stand-in.
+    monkeypatch.setattr(chat, "thread_pool", ThreadPool(chat.create_thread_id, low=0, high=0))
+    monkeypatch.setattr(chat, "response_cache", ResponseCache())
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    return app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+        yield client
+
+
+async def send(client: httpx.AsyncClient, message: str, thread_id: Optional[str] = None):
+    thread_id = thread_id or (await client.post("/api/chat/start")).json()["thread_id"]
+    response = await client.get("/api/chat/stream", params={"message": message, "thread_id": thread_id})
+    assert response.status_code == 200
+    return thread_id, parse_sse(response.text)
+
+
+@pytest.mark.anyio
+async def test_stream_and_resume_from_last_event_id(client):
+    _, frames = await send(client, "Hello, what do you sell?")
+    assert [frame["type"] for frame in frames] == ["start", "stream", "timing", "end"]
+
+    response = await client.get("/api/chat/stream", headers={"Last-Event-ID": frames[1]["id"]})
+    assert [frame["id"] for frame in parse_sse(response.text)] == [frame["id"] for frame in frames[2:]]
+
+    expired = await client.get("/api/chat/stream", headers={"Last-Event-ID": "unknown:1"})
+    assert expired.status_code == 410
+
+
+@pytest.mark.anyio
+async def test_open_circuit_answers_from_the_catalog(client, standin):
+    thread_id = (await client.post("/api/chat/start")).json()["thread_id"]
+    for _ in range(settings.OPENAI_BREAKER_MIN_CALLS):
+        chat.ai_service.breaker.record(failed=True)
+    runs = standin.state.stats["runs"]
+
+    _, frames = await send(client, "Tell me about product 1", thread_id)
+    assert [frame["type"] for frame in frames] == ["start", "stream", "end"]
+    assert "Product 1" in frames[1]["content"]
+    assert standin.state.stats["runs"] == runs
+
+
+
+@pytest.mark.anyio
+async def test_opening_questions_are_answered_from_the_response_cache(client, standin):
+    _, first = await send(client, "What payment methods do you accept?")
+    runs = standin.state.stats["runs"]
+
+    thread_id, cached = await send(client, "Which payment methods do you accept?")
+    assert [frame["type"] for frame in cached] == ["start", "stream", "timing", "end"]
+    assert cached[1]["content"] == first[1]["content"]
+    assert standin.state.stats["runs"] == runs
+    assert chat.response_cache.stats()["semantic_hits"] == 1
+
+    # Later turns may depend on the conversation, so they always run.
+    await send(client, "What payment methods do you accept?", thread_id)
+    assert standin.state.stats["runs"] == runs + 1
+
+
+@pytest.mark.anyio
+async def test_opening_is_decided_by_the_thread_not_the_worker(client, standin):
+    await send(client, "What payment methods do you accept?")
+    # A thread this worker has never seen, with turns served elsewhere (another worker, before a restart).
+    thread_id = (await client.post("/api/chat/start")).json()["thread_id"]
+    await chat.ai_service.record_exchange(thread_id, "I want product 2", "Product 2 costs $15.99.")
+    runs = standin.state.stats["runs"]
+
+    await send(client, "What payment methods do you accept?", thread_id)
+    await send(client, "Do you ship to Slovakia and Slovenia?", thread_id)
+    assert standin.state.stats["runs"] == runs + 2
+    assert chat.response_cache.stats()["entries"] == 1
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status", ["failed", "cancelled", "expired", "incomplete"])
+async def test_unfinished_run_ends_with_an_error(client, monkeypatch, status):
+    async def run_assistant(thread_id, instructions=None, event_handler_factory=None, tool_handler=None):
+        return SimpleNamespace(id="run_1", status=status)
+
+    monkeypatch.setattr(chat.ai_service, "run_assistant", run_assistant)
+    _, frames = await send(client, "Hello, what do you sell?")
+    assert [frame["type"] for frame in frames] == ["error", "timing", "end"]
+    assert frames[0]["content"] == f"Run {status}"
+
+def test_websocket_rejects_invalid_frames(app):
+    with TestClient(app).websocket_connect("/api/chat/ws") as websocket:
+        websocket.send_text("[1, 2]")
+        assert websocket.receive_json() == {"type": "error", "content": "Invalid frame"}
+        websocket.send_text("not json")
+        assert websocket.receive_json() == {"type": "error", "content": "Invalid JSON"}
+        websocket.send_text('{"type": "message", "thread_id": "t"}')
+        assert websocket.receive_json() == {"type": "error", "content": "Invalid frame", "thread_id": "t"}
+
+
+def test_websocket_keeps_forwarding_the_current_run_after_a_follow_up(app, monkeypatch):
+    # The follow-up gets a new stream while the first run is still streaming; both must finish.
+    follow_up_sent = {}
+
+    async def first_run(stream):
+        await stream.publish({"type": "delta", "content": "one"})
+        await follow_up_sent.setdefault("event", asyncio.Event()).wait()
+        await stream.publish({"type": "end", "content": "one"})
+
+    async def second_run(stream):
+        follow_up_sent.setdefault("event", asyncio.Event()).set()
+        await stream.publish({"type": "end", "content": "two"})
+
+    async def start_run_stream(thread_id, message, instructions=None, priority=None, timing=None):
+        return chat.run_streams.start(first_run if message == "one" else second_run)
+
+    monkeypatch.setattr(chat, "start_run_stream", start_run_stream)
+    with TestClient(app).websocket_connect("/api/chat/ws") as websocket:
+        websocket.send_json({"type": "message", "thread_id": "t", "message": "one"})
+        assert websocket.receive_json()["content"] == "one"
+        websocket.send_json({"type": "message", "thread_id": "t", "message": "two"})
+        frames = [websocket.receive_json() for _ in range(2)]
+    assert sorted((frame["type"], frame["content"]) for frame in frames) == [("end", "one"), ("end", "two")]
+    assert all(frame["thread_id"] == "t" for frame in frames)
@@ -0,0 +1,105 @@
+import pytest
+from backend.app.models.conversation import Conversation
+from backend.app.services.context_builder import ContextBuilder, LocalSummarizer
+
+pytestmark = pytest.mark.anyio
+
+SYSTEM = "You are a shop assistant."
+
+
+def text(label: str) -> str:
+    return label.ljust(40, ".")  # 10 tokens estimated, 14 with the message overhead
+
+
+class RecordingSummarizer(LocalSummarizer):
+    def __init__(self, counter):
+        super().__init__(counter, max_tokens=30)
+        self.folded = []
+
+    async def fold(self, summary, messages):
+        self.folded.append([message["content"] for message in messages])
+        return await super().fold(summary, messages)
+
+
+def builder(budget: int = 100) -> ContextBuilder:
+    context = ContextBuilder("gpt-4o-mini", budget=budget)
+    context.counter.encoding = None  # Character estimate, whether or not tiktoken is installed
+    context.summarizer = RecordingSummarizer(context.counter)
+    return context
+
+
+def turns(conversation: Conversation, *labels: str):
+    for label in labels:
+        conversation.messages.append({"role": "user", "content": text(f"Q {label}")})
+        conversation.messages.append({"role": "assistant", "content": text(f"A {label}")})
+
+
+async def test_conversation_within_budget_is_sent_verbatim():
+    context, conversation = builder(), Conversation(id="c")
+    turns(conversation, "1", "2", "3")
+    messages = await context.build(conversation, SYSTEM)
+    assert messages == [{"role": "system", "content": SYSTEM}] + conversation.messages
+    assert conversation.token_counts == [14] * 6 and not context.summarizer.folded
+
+
+async def test_over_budget_trims_to_the_target_and_folds_the_rest():
+    context, conversation = builder(), Conversation(id="c")
+    turns(conversation, "1", "2", "3", "4")
+    messages = await context.build(conversation, SYSTEM)
+
+    # 112 tokens against 100: keep at most (100 - 30) * 0.75, starting on a customer message.
+    assert conversation.summarized_upto == 6
+    assert messages[2:] == conversation.messages[6:]
+    assert context.summarizer.folded == [[message["content"] for message in conversation.messages[:6]]]
+    # The summary is capped by dropping its oldest lines.
+    assert messages[1] == {"role": "system", "content": "Summary of the earlier conversation:\n"
+                                                        f"- Customer: {text('Q 3')}\n- Assistant: {text('A 3')}"}
+
+
+async def test_window_never_starts_inside_a_tool_exchange():
+    context, conversation = builder(budget=90), Conversation(id="c")
+    conversation.messages += [
+        {"role": "user", "content": text("Q 1")},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_1", "type": "function", "function": {"name": "get_product_info", "arguments": '{"product_id": 1}'}}]},
+        {"role": "tool", "tool_call_id": "call_1", "content": text("Product 1")},
+        {"role": "assistant", "content": text("A 1")},
+        {"role": "user", "content": text("Q 2")},
+        {"role": "assistant", "content": text("A 2")},
+        {"role": "user", "content": text("Q 3")},
+    ]
+    messages = await context.build(conversation, SYSTEM)
+    assert messages[2]["role"] == "user" and conversation.summarized_upto == 4
+    assert f"- Tool result: {text('Product 1')}" in conversation.summary
+
+
+async def test_later_turns_fold_only_newly_evicted_messages():
+    context, conversation = builder(), Conversation(id="c")
+    turns(conversation, "1", "2", "3", "4")
+    await context.build(conversation, SYSTEM)
+    assert conversation.summarized_upto == 6
+
+    turns(conversation, "5")
+    await context.build(conversation, SYSTEM)
+    assert conversation.summarized_upto == 6  # Still fits next to the summary
+
+    turns(conversation, "6")
+    await context.build(conversation, SYSTEM)
+    assert conversation.summarized_upto == 10
+    assert context.summarizer.folded[1] == [text("Q 4"), text("A 4"), text("Q 5"), text("A 5")]
+    assert conversation.summary == f"- Customer: {text('Q 5')}\n- Assistant: {text('A 5')}"
+
+
+async def test_prefix_stays_stable_until_the_next_fold():
+    context, conversation = builder(), Conversation(id="c")
+    turns(conversation, "1", "2", "3", "4")
+    await context.build(conversation, SYSTEM)
+    prefix, tokens = conversation.prefix, conversation.prefix_tokens
+
+    conversation.messages.append({"role": "user", "content": "Thanks"})
+    await context.build(conversation, SYSTEM)
+    assert conversation.prefix is prefix and conversation.prefix_tokens == tokens
+    assert len(context.summarizer.folded) == 1
+
+    await context.build(conversation, "Another system prompt")
+    assert conversation.prefix is not prefix
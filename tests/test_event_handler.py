@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from backend.app.core.event_handler import ChatEventHandler, DeltaCoalescer
+
+pytestmark = pytest.mark.anyio
+
+
+def sink():
+    frames = []
+
+    async def send(frame: dict):
+        frames.append(frame)
+    return frames, send
+
+
+async def test_deltas_are_merged_until_the_size_limit():
+    frames, send = sink()
+    coalescer = DeltaCoalescer(send, window_ms=1000, max_chars=5)
+    for piece in ("ab", "cd", "ef", "g"):
+        await coalescer.add(piece)
+    assert frames == [{"type": "stream", "content": "abcdef"}]
+    await coalescer.flush()
+    assert frames[-1] == {"type": "stream", "content": "g"}
+
+
+async def test_deltas_are_flushed_after_the_window():
+    frames, send = sink()
+    coalescer = DeltaCoalescer(send, window_ms=10, max_chars=1000)
+    await coalescer.add("Hel")
+    await coalescer.add("lo")
+    assert frames == []
+    await asyncio.sleep(0.05)
+    assert frames == [{"type": "stream", "content": "Hello"}]
+
+
+async def test_zero_window_sends_every_delta():
+    frames, send = sink()
+    coalescer = DeltaCoalescer(send, window_ms=0)
+    await coalescer.add("a")
+    await coalescer.add("b")
+    assert [frame["content"] for frame in frames] == ["a", "b"]
+
+
+async def test_buffered_text_goes_out_before_tool_calls_and_at_the_end():
+    frames, send = sink()
+    handler = ChatEventHandler(send)
+    handler.coalescer = DeltaCoalescer(send, window_ms=1000, max_chars=1000)
+    await handler.on_text_created(None)
+    await handler.on_text_delta(SimpleNamespace(value="Let me check"), None)
+    await handler.on_tool_call_created("get_product_info")
+    await handler.on_text_delta(SimpleNamespace(value="Done."), None)
+    await handler.on_end()
+
+    assert [(frame["type"], frame["content"]) for frame in frames] == [
+        ("start", ""), ("stream", "Let me check"), ("tool_call", "get_product_info"), ("stream", "Done."),
+    ]
+    assert handler.full_response == "Let me checkDone."
@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from backend.app.core.config import settings
+from backend.app.core.resilience import CircuitBreaker, CircuitOpen, Resilience, is_retryable
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = httpx.Request("POST", "http://standin/v1/threads")
+
+
+def server_error() -> openai.InternalServerError:
+    return openai.InternalServerError("boom", response=httpx.Response(500, request=REQUEST), body=None)
+
+
+def not_sent() -> openai.APIConnectionError:
+    error = openai.APIConnectionError(request=REQUEST)
+    error.__cause__ = httpx.ConnectError("refused")
+    return error
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_RETRY_BASE_DELAY", 0.0)
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=10, min_calls=4, failure_ratio=0.5, slow_call=1.0, slow_ratio=0.5, open_seconds=0.05)
+    return CircuitBreaker("test", **{**options, **kwargs})
+
+
+def flaky(failures: list):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+    return call, calls
+
+
+def test_retryable_errors():
+    assert is_retryable(server_error(), idempotent=True)
+    assert not is_retryable(server_error(), idempotent=False)
+    assert is_retryable(not_sent(), idempotent=False)
+    assert is_retryable(openai.RateLimitError("slow down", response=httpx.Response(429, request=REQUEST), body=None),
+                        idempotent=False)
+
+
+def test_breaker_opens_on_failure_ratio_and_half_opens_after_the_timeout():
+    circuit = breaker()
+    for failed in (False, True, False):
+        circuit.record(0.1, failed)
+    assert circuit.state == "closed"
+    circuit.record(failed=True)
+    assert circuit.state == "open" and not circuit.allow()
+
+
+async def test_half_open_allows_one_trial_and_its_outcome_decides():
+    circuit = breaker(min_calls=1)
+    circuit.record(failed=True)
+    await asyncio.sleep(0.06)
+    assert circuit.state == "half_open"
+    assert circuit.allow()
+    assert not circuit.allow()  # The trial is in flight.
+    circuit.record(0.1)
+    assert circuit.state == "closed"
+
+    circuit.record(failed=True)
+    await asyncio.sleep(0.06)
+    assert circuit.allow()
+    circuit.record(failed=True)
+    assert circuit.state == "open"
+
+
+def test_slow_calls_open_the_breaker():
+    circuit = breaker()
+    for _ in range(4):
+        circuit.record(2.0)
+    assert circuit.is_open
+
+
+async def test_idempotent_calls_are_retried():
+    call, calls = flaky([server_error(), server_error()])
+    assert await Resilience(attempts=3, deadline=5).call("test", call) == "ok"
+    assert len(calls) == 3
+
+
+async def test_non_idempotent_calls_retry_only_when_the_request_was_not_sent():
+    call, calls = flaky([server_error()])
+    with pytest.raises(openai.InternalServerError):
+        await Resilience(attempts=3, deadline=5).call("test", call, idempotent=False)
+    assert len(calls) == 1
+
+    call, calls = flaky([not_sent()])
+    assert await Resilience(attempts=3, deadline=5).call("test", call, idempotent=False) == "ok"
+    assert len(calls) == 2
+
+
+async def test_open_circuit_fails_fast():
+    circuit = breaker(min_calls=1)
+    circuit.record(failed=True)
+    call, calls = flaky([])
+    with pytest.raises(CircuitOpen):
+        await Resilience(breaker=circuit).call("test", call)
+    assert not calls
+
+
+async def test_half_open_circuit_sends_a_single_trial():
+    circuit = breaker(min_calls=1)
+    circuit.record(failed=True)
+    await asyncio.sleep(0.06)
+    started = []
+
+    async def slow():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    resilience = Resilience(attempts=1, deadline=5, breaker=circuit)
+    results = await asyncio.gather(*(resilience.call("test", slow) for _ in range(5)), return_exceptions=True)
+    assert len(started) == 1
+    assert results.count("ok") == 1
+    assert sum(isinstance(result, CircuitOpen) for result in results) == 4
+    assert circuit.state == "closed"
+
+
+async def test_slow_read_is_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_HEDGE_DELAY", 0.02)
+    attempts = []
+
+    async def read():
+        attempts.append(1)
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.0)
+        return len(attempts)
+
+    result = await asyncio.wait_for(Resilience(deadline=5, hedge=True).call("hedge-test", read, hedge=True), 0.5)
+    assert result == 2
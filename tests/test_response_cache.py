@@ -0,0 +1,91 @@
+import pytest
+from backend.app.core.config import settings
+from backend.app.services import response_cache
+from backend.app.services.response_cache import ResponseCache, normalize
+
+SCOPE = "assistants:hash:instructions:0"
+
+
+@pytest.fixture
+def cache() -> ResponseCache:
+    return ResponseCache(max_entries=10, ttl=60, threshold=0.65)
+
+
+def test_normalize_ignores_case_accents_punctuation_and_spacing():
+    assert normalize("  Jak vrátím   ZBOŽÍ?! ") == "jak vratim zbozi"
+
+
+def test_exact_hit_after_normalising(cache):
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes, within 3 days.", latency=1.2)
+    hit = cache.get(SCOPE, "do you ship to  SLOVAKIA")
+    assert hit is not None and hit.answer == "Yes, within 3 days."
+    assert cache.hits == {"exact": 1, "semantic": 0}
+
+
+@pytest.mark.parametrize("question", ["Can you ship to Slovakia?", "Do you ship to the Slovakia"])
+def test_rephrasing_is_a_semantic_hit(cache, question):
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes.", latency=1.0)
+    assert cache.get(SCOPE, question) is not None
+    assert cache.hits["semantic"] == 1
+
+
+@pytest.mark.parametrize("question", [
+    "Do you ship to Slovenia?",            # A different place with a similar name
+    "Do you ship to Slovakia quickly?",    # An extra content word
+])
+def test_different_subject_is_a_miss(cache, question):
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes.", latency=1.0)
+    assert cache.get(SCOPE, question) is None
+
+
+def test_product_ids_must_match(cache):
+    cache.set(SCOPE, "What is the price of product 5", "$10.99", latency=1.0)
+    assert cache.get(SCOPE, "What is the price of product 6") is None
+
+
+def test_entries_are_scoped(cache):
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes.", latency=1.0)
+    assert cache.get("assistants:other-hash:instructions:0", "Do you ship to Slovakia?") is None
+
+
+def test_entries_expire(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes.", latency=1.0)
+    now[0] += 61
+    assert cache.get(SCOPE, "Do you ship to Slovakia?") is None
+    assert cache.get(SCOPE, "Can you ship to Slovakia?") is None
+    assert not cache.entries and not cache.postings
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl=60, threshold=0.65)
+    cache.set(SCOPE, "Do you ship to Slovakia?", "a", latency=1.0)
+    cache.set(SCOPE, "What payment methods do you accept?", "b", latency=1.0)
+    cache.get(SCOPE, "Do you ship to Slovakia?")
+    cache.set(SCOPE, "How do I return a product?", "c", latency=1.0)
+
+    assert cache.get(SCOPE, "What payment methods do you accept?") is None
+    assert cache.get(SCOPE, "Do you ship to Slovakia?") is not None
+    assert cache.evictions == 1
+    indexed = set().union(*cache.postings.values())
+    assert indexed == set(cache.entries)
+
+
+def test_eligibility(cache, monkeypatch):
+    assert cache.eligible("Do you ship to Slovakia?")
+    assert not cache.eligible("how much?")
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    assert not cache.eligible("Do you ship to Slovakia?")
+
+
+def test_stats_report_hit_ratio_and_saved_time(cache):
+    cache.set(SCOPE, "Do you ship to Slovakia?", "Yes.", latency=1.5)
+    hit = cache.get(SCOPE, "Do you ship to Slovakia?")
+    cache.record_saved(hit, 0.25)
+    cache.get(SCOPE, "Do you sell gift cards?")
+
+    stats = cache.stats()
+    assert stats["exact_hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["saved_seconds"] == 1.25
@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+from backend.app.core.metrics import metrics
+from backend.app.services.run_scheduler import Priority, RunScheduler, SchedulerFull
+from backend.app.services.run_stream import RunStream, RunStreamRegistry
+from backend.app.services.thread_actor import ThreadActors
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_grants_up_to_capacity_then_queues_by_priority():
+    scheduler = RunScheduler(max_concurrent=1, max_queue=10, max_wait=5)
+    await scheduler.acquire("a")
+    order = []
+
+    async def wait(session: str, priority: Priority):
+        await scheduler.acquire(session, priority)
+        order.append(session)
+
+    waiters = [asyncio.ensure_future(wait("anon", Priority.ANONYMOUS)),
+               asyncio.ensure_future(wait("checkout", Priority.CHECKOUT))]
+    await asyncio.sleep(0)
+    assert len(scheduler.waiters) == 2
+
+    scheduler.release("a")
+    await asyncio.sleep(0.01)
+    assert order == ["checkout"]
+    scheduler.release("checkout")
+    await asyncio.gather(*waiters)
+    assert order == ["checkout", "anon"]
+
+
+async def test_release_reports_the_active_gauge():
+    scheduler = RunScheduler(max_concurrent=2, max_queue=10, max_wait=5)
+    await scheduler.acquire("a")
+    assert metrics.gauges["runs_active"] == 1
+    scheduler.release("a", 0.5)
+    assert metrics.gauges["runs_active"] == 0
+    assert scheduler.active == 0 and not scheduler.is_active("a")
+
+
+async def test_full_queue_and_deadline_are_rejected_with_retry_after():
+    scheduler = RunScheduler(max_concurrent=1, max_queue=1, max_wait=0.05)
+    await scheduler.acquire("a")
+    queued = asyncio.ensure_future(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerFull) as full:
+        await scheduler.acquire("c")
+    assert full.value.reason == "full" and full.value.retry_after >= 1
+
+    with pytest.raises(SchedulerFull) as late:
+        await queued
+    assert late.value.reason == "deadline"
+    assert not scheduler.waiters
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = RunScheduler(max_concurrent=1, max_queue=10, max_wait=5)
+    await scheduler.acquire("a")
+    waiter = asyncio.ensure_future(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert not scheduler.waiters
+    scheduler.release("a")
+    assert scheduler.active == 0
+
+
+def actors(max_concurrent: int = 10, max_queue: int = 10, max_wait: float = 5.0, merge_window_ms: float = 0):
+    scheduler = RunScheduler(max_concurrent=max_concurrent, max_queue=max_queue, max_wait=max_wait)
+    return ThreadActors(scheduler, RunStreamRegistry(), merge_window_ms=merge_window_ms)
+
+
+def recorder(runs: list, seconds: float = 0.0, release: asyncio.Event = None):
+    async def run(stream: RunStream, content: str, instructions):
+        runs.append(content)
+        if release is not None:
+            await release.wait()
+        await asyncio.sleep(seconds)
+        await stream.publish({"type": "end", "content": ""})
+    return run
+
+
+async def test_messages_sent_during_a_run_are_merged_into_the_next_one():
+    thread_actors = actors(merge_window_ms=10)
+    runs, release = [], asyncio.Event()
+    run = recorder(runs, release=release)
+
+    first = await thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run)
+    second = asyncio.ensure_future(thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run))
+    await asyncio.sleep(0)
+    third = await thread_actors.submit("t", "three", None, Priority.ANONYMOUS, run)
+    release.set()
+
+    assert (await second) is third
+    await first.task
+    await third.task
+    assert runs == ["one", "two\n\nthree"]
+    assert not thread_actors.running and not thread_actors.pending
+
+
+async def test_follow_up_waits_for_a_run_longer_than_the_queue_deadline():
+    # Waiting for the thread's own run is not admission: only the global slot has a deadline.
+    thread_actors = actors(max_wait=0.05)
+    runs = []
+    run = recorder(runs, seconds=0.2)
+
+    first = await thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run)
+    second = await thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run)
+    await second.task
+    assert first.done and runs == ["one", "two"]
+
+
+async def test_follow_up_is_shed_up_front_when_the_queue_is_full():
+    thread_actors = actors(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+    run = recorder([], release=release)
+    await thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run)
+    other = asyncio.ensure_future(thread_actors.submit("u", "one", None, Priority.ANONYMOUS, run))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerFull) as full:
+        await thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run)
+    # Includes the estimated rest of the thread's current run.
+    assert full.value.retry_after >= thread_actors.remaining("t")
+    assert "t" not in thread_actors.pending
+    release.set()
+    await (await other).task
+
+
+async def test_merged_senders_get_an_error_when_the_batch_is_rejected():
+    thread_actors = actors(max_concurrent=1, max_queue=10, max_wait=0.05)
+    release = asyncio.Event()
+    run = recorder([], release=release)
+    await thread_actors.submit("busy", "one", None, Priority.ANONYMOUS, run)
+
+    rejected = asyncio.ensure_future(thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run))
+    await asyncio.sleep(0)
+    merged = await thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run)
+    with pytest.raises(SchedulerFull):
+        await rejected
+    frames = [frame["type"] async for _, frame in merged.subscribe()]
+    assert frames == ["error", "end"]
+    release.set()
+
+
+async def test_reply_without_a_run_holds_the_thread_but_takes_no_slot():
+    thread_actors = actors(max_concurrent=1)
+    runs, replies, release = [], [], asyncio.Event()
+    run = recorder(runs)
+
+    async def answer(content, instructions):
+        async def reply(stream: RunStream):
+            replies.append(content)
+            await release.wait()
+            await stream.publish({"type": "end", "content": ""})
+        return reply
+
+    cached = await thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run, answer)
+    assert thread_actors.scheduler.active == 0 and "t" in thread_actors.running
+    follow_up = asyncio.ensure_future(thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run, answer))
+    await asyncio.sleep(0.01)
+    assert not follow_up.done() and not runs
+
+    release.set()
+    await cached.task
+    await (await follow_up).task
+    assert replies == ["one"] and runs == ["two"]
+
+
+async def test_messages_arriving_during_the_lookup_are_run_together():
+    thread_actors = actors()
+    runs, looked_up = [], asyncio.Event()
+    run = recorder(runs)
+
+    async def answer(content, instructions):
+        looked_up.set()
+        await asyncio.sleep(0.01)
+        return lambda stream: stream.publish({"type": "end", "content": "cached"})
+
+    first = asyncio.ensure_future(thread_actors.submit("t", "one", None, Priority.ANONYMOUS, run, answer))
+    await looked_up.wait()
+    second = await thread_actors.submit("t", "two", None, Priority.ANONYMOUS, run, answer)
+    assert (await first) is second
+    await second.task
+    assert runs == ["one\n\ntwo"]
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from backend.app.services.run_stream import RunStream, RunStreamRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+def frame(n: int) -> dict:
+    return {"type": "stream", "content": str(n)}
+
+
+async def collect(stream: RunStream, after: int = 0):
+    return [seq async for seq, _ in stream.subscribe(after)]
+
+
+async def test_replays_frames_after_last_event_id():
+    stream = RunStream("s", buffer_size=16, queue_size=4, backpressure_timeout=1.0)
+    for n in range(1, 4):
+        await stream.publish(frame(n))
+    await stream.close()
+
+    assert await collect(stream) == [1, 2, 3]
+    assert await collect(stream, after=2) == [3]
+    assert await collect(stream, after=3) == []
+
+
+async def test_resume_continues_a_run_that_kept_going():
+    registry = RunStreamRegistry(buffer_size=16)
+    step = asyncio.Event()
+
+    async def produce(stream: RunStream):
+        await stream.publish(frame(1))
+        await step.wait()
+        for n in range(2, 5):
+            await stream.publish(frame(n))
+
+    stream = registry.start(produce)
+    async for seq, _ in stream.subscribe():
+        break  # The client drops after the first frame.
+    step.set()
+
+    resumed = registry.get(stream.id)
+    assert resumed is stream
+    assert await collect(resumed, after=seq) == [2, 3, 4]
+
+
+async def test_ring_buffer_keeps_only_the_newest_frames():
+    stream = RunStream("s", buffer_size=2, queue_size=4, backpressure_timeout=1.0)
+    for n in range(1, 5):
+        await stream.publish(frame(n))
+    await stream.close()
+
+    assert await collect(stream) == [3, 4]
+
+
+async def test_publish_waits_for_a_slow_reader():
+    stream = RunStream("s", buffer_size=16, queue_size=1, backpressure_timeout=5.0)
+    reader = stream.subscribe_batches()
+    first = asyncio.ensure_future(reader.__anext__())
+    await asyncio.sleep(0)  # Attached and waiting.
+    await stream.publish(frame(1))
+    assert [seq for seq, _ in await first] == [1]
+
+    await stream.publish(frame(2))  # Fills the reader's queue.
+    blocked = asyncio.ensure_future(stream.publish(frame(3)))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    assert [seq for seq, _ in await reader.__anext__()] == [2]
+    await asyncio.wait_for(blocked, 1.0)
+    await reader.aclose()
+
+
+async def test_stalled_reader_is_detached_and_catches_up_from_the_buffer():
+    stream = RunStream("s", buffer_size=64, queue_size=1, backpressure_timeout=0.01)
+    reader = stream.subscribe()
+    waiting = asyncio.ensure_future(reader.__anext__())
+    await asyncio.sleep(0)
+    await stream.publish(frame(1))
+    assert (await waiting)[0] == 1
+
+    for n in range(2, 11):  # The reader does not read; the producer must not wait for it.
+        await asyncio.wait_for(stream.publish(frame(n)), 1.0)
+    await stream.close()
+    assert not stream.subscribers
+
+    assert [seq async for seq, _ in reader] == list(range(2, 11))
+
+
+async def test_finished_streams_expire():
+    registry = RunStreamRegistry(ttl=0)
+
+    async def produce(stream: RunStream):
+        await stream.publish(frame(1))
+
+    stream = registry.start(produce)
+    await stream.task
+    await asyncio.sleep(0.01)
+    assert registry.get(stream.id) is None
+
+
+def test_event_ids_round_trip():
+    stream = RunStream("abc:def", buffer_size=1, queue_size=1, backpressure_timeout=1.0)
+    event_id = RunStreamRegistry.format_event_id(stream, 7)
+    assert RunStreamRegistry.parse_event_id(event_id) == ("abc:def", 7)
+    assert RunStreamRegistry.parse_event_id("no-seq") is None
+    assert RunStreamRegistry.parse_event_id("abc:x") is None
+    assert RunStreamRegistry.parse_event_id(None) is None
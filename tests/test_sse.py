@@ -0,0 +1,32 @@
+import json
+
+import pytest
+from backend.app.core.sse import FRAME_TYPES, encode_frame, encode_frames
+
+
+def legacy(frame: dict, event_id=None) -> bytes:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}data: {json.dumps(frame)}\n\n".encode("utf-8")
+
+
+@pytest.mark.parametrize("frame_type", FRAME_TYPES)
+@pytest.mark.parametrize("content", ["", "plain text", 'quotes " and \\ backslash', "line\nbreak\ttab",
+                                     "Příliš žluťoučký kůň 🐎", " \x00"])
+def test_encoding_matches_json_dumps_byte_for_byte(frame_type, content):
+    frame = {"type": frame_type, "content": content}
+    assert encode_frame(frame) == legacy(frame)
+    assert encode_frame(frame, "abc:7") == legacy(frame, "abc:7")
+
+
+@pytest.mark.parametrize("frame", [
+    {"type": "custom", "content": "x"},
+    {"type": "stream", "content": "x", "thread_id": "t"},
+    {"type": "stream", "content": None},
+])
+def test_frames_outside_the_schema_take_the_generic_path(frame):
+    assert encode_frame(frame, "s:1") == legacy(frame, "s:1")
+
+
+def test_batches_are_concatenated_frames():
+    frames = [("s:1", {"type": "start", "content": ""}), ("s:2", {"type": "stream", "content": "hi"})]
+    assert encode_frames(frames) == b"".join(legacy(frame, event_id) for event_id, frame in frames)
@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+
+import pytest
+from backend.app.services.thread_pool import ThreadPool
+import backend.app.services.thread_pool as thread_pool_module
+
+pytestmark = pytest.mark.anyio
+
+
+class Threads:
+    """Fake thread creation: sequential ids, tracks concurrent creates, fails on demand."""
+
+    def __init__(self, failing: int = 0):
+        self.ids = itertools.count(1)
+        self.failing = failing
+        self.in_flight = 0
+        self.peak = 0
+
+    async def create(self) -> str:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            if self.failing:
+                self.failing -= 1
+                raise RuntimeError("upstream down")
+            return f"thread_{next(self.ids)}"
+        finally:
+            self.in_flight -= 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+async def test_warm_up_fills_to_the_high_watermark_in_batches():
+    threads = Threads()
+    pool = ThreadPool(threads.create, low=2, high=5, batch_size=2, max_age=60)
+    await pool.warm_up()
+    assert [thread_id for _, thread_id in pool.threads] == [f"thread_{i}" for i in range(1, 6)]
+    assert threads.peak == 2
+
+
+async def test_acquire_pops_and_refills_below_the_low_watermark():
+    threads = Threads()
+    pool = ThreadPool(threads.create, low=2, high=3, batch_size=3, max_age=60)
+    await pool.warm_up()
+
+    assert await pool.acquire() == "thread_1"
+    assert pool._refill is None  # Still at the low watermark
+    assert await pool.acquire() == "thread_2"
+    await pool._refill
+    assert [thread_id for _, thread_id in pool.threads] == ["thread_3", "thread_4", "thread_5"]
+
+
+async def test_empty_pool_creates_on_demand():
+    threads = Threads()
+    pool = ThreadPool(threads.create, low=0, high=0, max_age=60)
+    assert await pool.acquire() == "thread_1"
+    assert pool._refill is None and not pool.threads
+
+
+async def test_expired_threads_are_discarded(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(thread_pool_module, "time", clock)
+    threads = Threads()
+    pool = ThreadPool(threads.create, low=0, high=2, batch_size=2, max_age=60)
+    await pool.warm_up()
+
+    clock.now += 61
+    assert await pool.acquire() == "thread_3"
+    assert not pool.threads
+
+
+async def test_failed_refill_stops_and_warm_up_reports_it():
+    threads = Threads(failing=1)
+    pool = ThreadPool(threads.create, low=3, high=4, batch_size=2, max_age=60)
+    with pytest.raises(RuntimeError, match="below low watermark"):
+        await pool.warm_up()
+    assert len(pool.threads) == 1
@@ -0,0 +1,99 @@
+import pytest
+from backend.app.services.cart_service import CartService
+from backend.app.services.product_service import ProductService
+from backend.app.services.tool_cache import ToolResultCache
+from backend.app.services.tool_call_handler import ToolCallHandler, tool_cache
+import backend.app.services.tool_cache as tool_cache_module
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingProducts(ProductService):
+    def __init__(self):
+        super().__init__()
+        self.lookups = 0
+
+    def get_product(self, product_id: int):
+        self.lookups += 1
+        return super().get_product(product_id)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_tool_cache():
+    tool_cache.clear()
+    yield
+    tool_cache.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tool_cache_module, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = ToolResultCache(max_entries=10)
+    cache.set("key", "output", ttl=5)
+    assert cache.get("tool", "key") == "output"
+    clock.now += 5
+    assert cache.get("tool", "key") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ToolResultCache(max_entries=2)
+    cache.set("a", "A", ttl=60)
+    cache.set("b", "B", ttl=60)
+    assert cache.get("tool", "a") == "A"
+    cache.set("c", "C", ttl=60)
+    assert cache.get("tool", "b") is None
+    assert cache.get("tool", "a") == "A" and cache.get("tool", "c") == "C"
+    assert cache.evictions == 1
+
+
+async def test_product_lookups_are_shared_until_the_catalog_changes():
+    products = CountingProducts()
+    first = ToolCallHandler(products, CartService())
+    second = ToolCallHandler(products, CartService())
+
+    assert (await first.call_tool("get_product_info", '{"product_id": 1}')).startswith("Product: Product 1, Price: $10.99,")
+    assert (await second.call_tool("get_product_info", '{"product_id": 1}')).startswith("Product: Product 1, Price: $10.99,")
+    assert products.lookups == 1
+
+    products.products[1]["price"] = 9.99
+    products.version += 1
+    assert (await second.call_tool("get_product_info", '{"product_id": 1}')).startswith("Product: Product 1, Price: $9.99,")
+    assert products.lookups == 2
+
+
+async def test_cart_summary_follows_cart_changes_and_stays_per_cart():
+    products = ProductService()
+    cart, other_cart = CartService(), CartService()
+    handler = ToolCallHandler(products, cart)
+
+    assert await handler.call_tool("get_cart_summary", "{}") == "Cart: 0 items, Total: $0.00"
+    await handler.call_tool("update_cart", '{"product_id": 2, "quantity": 2}')
+    assert await handler.call_tool("get_cart_summary", "{}") == "Cart: 2 items, Total: $31.98"
+
+    other_cart.add_to_cart(1)
+    other = ToolCallHandler(products, other_cart)
+    assert await other.call_tool("get_cart_summary", "{}") == "Cart: 1 items, Total: $10.99"
+
+
+async def test_cart_writes_are_never_cached():
+    cart = CartService()
+    handler = ToolCallHandler(ProductService(), cart)
+    for _ in range(2):
+        await handler.call_tool("update_cart", '{"product_id": 1}')
+    assert cart.get_cart() == {1: 2}
+    assert tool_cache.stats()["entries"] == 0
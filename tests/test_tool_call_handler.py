@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from backend.app.services.cart_service import CartService
+from backend.app.services.product_service import ProductService
+from backend.app.services.tool_call_handler import ToolCallHandler, tool_cache
+
+pytestmark = pytest.mark.anyio
+
+
+class Overlap:
+    """Counts how many calls are inside a section at once."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(0.05)
+        with self._lock:
+            self.current -= 1
+
+
+class SlowProducts(ProductService):
+    def __init__(self, overlap: Overlap):
+        super().__init__()
+        self.overlap = overlap
+
+    def get_product(self, product_id: int):
+        self.overlap.enter()
+        return super().get_product(product_id)
+
+
+class SlowCart(CartService):
+    def __init__(self, overlap: Overlap):
+        super().__init__()
+        self.overlap = overlap
+
+    def add_to_cart(self, product_id: int, quantity: int = 1):
+        self.overlap.enter()
+        super().add_to_cart(product_id, quantity)
+
+
+def call(name: str, **arguments):
+    return SimpleNamespace(id=f"call_{name}_{len(arguments)}", function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+@pytest.fixture(autouse=True)
+def empty_tool_cache():
+    tool_cache.clear()
+    yield
+    tool_cache.clear()
+
+
+async def test_read_only_tools_run_in_parallel_and_keep_the_call_order():
+    overlap = Overlap()
+    handler = ToolCallHandler(SlowProducts(overlap), CartService())
+    calls = [call("get_product_info", product_id=1), call("get_product_info", product_id=2)]
+
+    outputs = await handler.execute_tool_calls(calls)
+
+    assert overlap.peak == 2
+    assert [output["tool_call_id"] for output in outputs] == [c.id for c in calls]
+    assert "Product 1" in outputs[0]["output"] and "Product 2" in outputs[1]["output"]
+
+
+async def test_cart_tools_take_turns():
+    overlap = Overlap()
+    cart = SlowCart(overlap)
+    handler = ToolCallHandler(ProductService(), cart)
+    calls = [call("update_cart", product_id=1, quantity=1), call("update_cart", product_id=1, quantity=2),
+             call("get_cart_summary")]
+
+    outputs = await handler.execute_tool_calls(calls)
+
+    assert overlap.peak == 1
+    assert cart.get_cart() == {1: 3} and cart.version == 2
+    # Whenever the summary ran, a fresh one now must agree with the cart it was cached for.
+    assert await handler.call_tool("get_cart_summary", "{}") == "Cart: 3 items, Total: $32.97"
+    assert outputs[2]["output"].startswith("Cart: ")
+
+
+async def test_invalid_arguments_are_rejected_before_the_tool_runs():
+    cart = CartService()
+    handler = ToolCallHandler(ProductService(), cart)
+    output = await handler.call_tool("update_cart", '{"product_id": "one", "quantity": 0}')
+    assert output.startswith("Invalid arguments for update_cart")
+    assert cart.get_cart() == {} and cart.version == 0
+    assert await handler.call_tool("no_such_tool", "{}") == "Unknown tool: no_such_tool"
@@ -0,0 +1,58 @@
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+# Imported from the handler module, which registers the shop tools.
+from backend.app.services.tool_call_handler import tool_registry
+from backend.app.services.tool_registry import ToolRegistry
+
+
+class EchoArgs(BaseModel):
+    text: str = Field(description="What to echo")
+    times: int = Field(1, ge=1)
+
+
+def test_shop_tools_are_registered_with_their_schemas():
+    names = [schema["function"]["name"] for schema in tool_registry.schemas()]
+    assert names == ["get_product_info", "search_products", "update_cart", "get_cart_summary"]
+    parameters = tool_registry.get("update_cart").schema["function"]["parameters"]
+    assert parameters["required"] == ["product_id"]
+    assert "title" not in parameters and "title" not in parameters["properties"]["quantity"]
+    assert parameters["properties"]["action"]["enum"] == ["add", "remove"]
+
+
+def test_cart_summary_schema_has_empty_properties():
+    parameters = tool_registry.get("get_cart_summary").schema["function"]["parameters"]
+    assert parameters == {"properties": {}, "type": "object"}
+
+
+def test_registration_flags_and_schema_cache():
+    registry = ToolRegistry()
+
+    @registry.tool("echo", "Echo text", EchoArgs, read_only=True, cache_ttl=5)
+    def echo(handler, arguments):
+        return arguments.text * arguments.times
+
+    first = registry.schemas()
+    assert registry.schemas() is first
+
+    @registry.tool("shout", "Echo loudly", EchoArgs, cache_ttl=5)
+    async def shout(handler, arguments):
+        return arguments.text.upper()
+
+    assert [schema["function"]["name"] for schema in registry.schemas()] == ["echo", "shout"]
+    assert registry.get("echo").cache_ttl == 5 and not registry.get("echo").is_async
+    # Writes are never cached, whatever they declare.
+    assert registry.get("shout").cache_ttl == 0.0 and registry.get("shout").is_async
+    assert registry.get("missing") is None
+
+
+def test_decode_validates_arguments():
+    registry = ToolRegistry()
+    registry.tool("echo", "Echo text", EchoArgs)(lambda handler, arguments: arguments.text)
+    tool = registry.get("echo")
+    assert tool.decode('{"text": "hi", "times": 2}') == EchoArgs(text="hi", times=2)
+    with pytest.raises(ValidationError):
+        tool.decode('{"text": "hi", "times": 0}')
+    with pytest.raises(ValidationError):
+        tool.decode(None)
+    with pytest.raises(ValidationError):
+        tool.decode("not json")